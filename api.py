@@ -0,0 +1,231 @@
+# api.py — API HTTP local para integraciones (CRM, scripts), solo stdlib
+#
+#   python api.py --port 8765 --workers 8 --queue 64
+#
+#   POST /quote        {"brief": "...", "cliente_tipo": "PyME", ...}   → salida de quote_brief
+#   POST /quote/batch  {"items": [{...}, ...]}  (o directamente una lista) → {"results": [...]}
+#   POST /pdf          {"brief": "...", "scenario": "logico", "rate": 4000, ...} → application/pdf
+#                      ("scenarios": ["minimo", "logico", "maximo"] → un PDF con las tres secciones;
+#                       "currencies": ["COP", "MXN"] → montos en esas monedas, ver currency.py)
+#   Cualquier request acepta "tenant": "<id>" (tenants.json) para cotizar con el catálogo y el
+#   perfil de ese estudio; sin "tenant" se usa el de por defecto (o el de --catalog, si se pasó).
+#   GET  /health
+#   GET  /metrics      tiempos por etapa en formato Prometheus (ver tracing.py)
+#
+# El cálculo corre en un pool acotado de workers; cuando los workers y la cola están llenos
+# la API responde 503 con Retry-After en lugar de acumular trabajo (backpressure).
+# Las conexiones son HTTP/1.1 keep-alive.
+
+import argparse
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import tracing
+from asset_store import default_store
+from quote_core import SCENARIO_LABELS, load_catalog_file, pdf_filename, quote_brief, render_quote_pdf_bundle
+from currency import rate_matrix
+from tenants import DEFAULT_STUDIO, StudioProfile, catalog_for, get_tenant
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_ITEMS = 1000
+
+class Overloaded(Exception):
+    pass
+
+class QuoteService:
+    """Pool de workers con cupo acotado (workers + cola) para el trabajo de cotización."""
+
+    def __init__(self, catalog: Optional[Dict[str, Any]] = None, workers: int = 8, queue_size: int = 64):
+        self.catalog = catalog  # catálogo fijo (--catalog); None → el del tenant de cada request
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded()
+        try:
+            fut = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _f: self._slots.release())
+        return fut
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    # --- trabajos ---
+    def tenant(self, item: Dict[str, Any]) -> Tuple[Dict[str, Any], StudioProfile]:
+        """(catálogo, perfil del estudio) para el request; ValueError si el tenant no existe."""
+        tid = item.get("tenant")
+        if self.catalog is not None and not tid:
+            return self.catalog, DEFAULT_STUDIO
+        t = get_tenant(str(tid) if tid else None)
+        return catalog_for(t.id), t.studio
+
+    def quote(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        brief = str(item.get("brief") or "").strip()
+        if not brief:
+            raise ValueError("brief vacío")
+        catalog, _ = self.tenant(item)
+        with tracing.span("quote"):
+            return quote_brief(catalog, brief, item)
+
+    def quote_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out = []
+        for item in items:
+            try:
+                out.append(self.quote(item))
+            except Exception as e:
+                out.append({"error": f"{type(e).__name__}: {e}"})
+        return out
+
+    def pdf(self, item: Dict[str, Any]) -> Tuple[bytes, str]:
+        # "scenarios": [...] arma un solo PDF con una sección por escenario
+        scenarios = item.get("scenarios") or [item.get("scenario", "logico")]
+        if not isinstance(scenarios, list):
+            raise ValueError("'scenarios' debe ser una lista")
+        for sc in scenarios:
+            if sc not in SCENARIO_LABELS:
+                raise ValueError(f"scenario inválido: {sc}")
+        result = self.quote(item)
+        cliente = str(item.get("cliente_nombre") or "")
+        catalog, studio = self.tenant(item)
+        rate = float(item.get("rate") or catalog.get("moneda", {}).get("usd_to_cop", 4300))
+        currencies = item.get("currencies")
+        if currencies is not None and not isinstance(currencies, list):
+            raise ValueError("'currencies' debe ser una lista")
+        fx = rate_matrix(catalog, {"COP": rate})
+        if currencies:
+            for code in currencies:
+                if str(code).upper() not in fx.index:
+                    raise ValueError(f"moneda sin tasa: {code}")
+        pdf = render_quote_pdf_bundle(result, item["brief"], cliente, scenarios, rate, studio,
+                                      currencies, fx)
+        return pdf, pdf_filename(cliente)
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers y body van en writes separados
+    server: "QuoteHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, ctype: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("body demasiado grande")
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw or b"{}")
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._json(200, {"ok": True})
+        elif self.path == "/metrics":
+            self._send(200, tracing.export_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        routes = {"/quote": self._quote, "/quote/batch": self._batch, "/pdf": self._pdf}
+        handler = routes.get(self.path)
+        try:
+            payload = self._read_json()
+        except ValueError as e:  # incluye JSONDecodeError
+            self.close_connection = True
+            self._json(400, {"error": f"JSON inválido: {e}"})
+            return
+        if handler is None:
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            handler(payload)
+        except Overloaded:
+            self._json(503, {"error": "servidor ocupado, reintentá"}, {"Retry-After": "1"})
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+        except Exception as e:
+            self._json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _quote(self, payload: Any) -> None:
+        if not isinstance(payload, dict):
+            raise ValueError("se esperaba un objeto JSON")
+        svc = self.server.service
+        self._json(200, svc.submit(svc.quote, payload).result())
+
+    def _batch(self, payload: Any) -> None:
+        items = payload.get("items") if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise ValueError("se esperaba una lista de objetos en 'items'")
+        if len(items) > MAX_BATCH_ITEMS:
+            raise ValueError(f"máximo {MAX_BATCH_ITEMS} items por lote")
+        svc = self.server.service
+        self._json(200, {"results": svc.submit(svc.quote_batch, items).result()})
+
+    def _pdf(self, payload: Any) -> None:
+        if not isinstance(payload, dict):
+            raise ValueError("se esperaba un objeto JSON")
+        svc = self.server.service
+        pdf, name = svc.submit(svc.pdf, payload).result()
+        self._send(200, pdf, "application/pdf",
+                   {"Content-Disposition": f'attachment; filename="{name}"'})
+
+class QuoteHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], service: QuoteService, quiet: bool = False):
+        super().__init__(addr, QuoteHandler)
+        self.service = service
+        self.quiet = quiet
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, catalog_path: Optional[str] = None,
+                workers: int = 8, queue_size: int = 64, quiet: bool = False) -> QuoteHTTPServer:
+    """
+    Crea el servidor sin arrancarlo (port=0 elige un puerto libre; útil en tests).
+    Sin `catalog_path` los catálogos salen de tenants.json (LRU compartido por tenant).
+    """
+    service = QuoteService(load_catalog_file(catalog_path) if catalog_path else None, workers, queue_size)
+    default_store().sweep()
+    return QuoteHTTPServer((host, port), service, quiet)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="API HTTP local del cotizador.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--catalog", default=None,
+                    help="Catálogo fijo para requests sin 'tenant' (por defecto, tenants.json)")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--queue", type=int, default=64, help="Trabajos en espera antes de responder 503")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.catalog, args.workers, args.queue, args.quiet)
+    print(f"Cotizador API en http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+if __name__ == "__main__":
+    main()
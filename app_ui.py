@@ -1,7 +1,8 @@
 import streamlit as st
 from parser import parse_brief
 from pricing import load_catalog, base_price_usd, apply_bundles, apply_coefs, to_scenarios, to_cop, explain, money
-from storage import init_db, save_quote, list_quotes
+from storage import STATS_LOCAL, init_db, save_quote, save_revision, list_quotes, quote_history, read_stats
+import themes
 
 st.set_page_config(page_title="Bravo – Cotizador", page_icon="💸", layout="wide")
 
@@ -51,7 +52,6 @@ def apply_theme_styles(theme):
         }
     
     css = f"""
-    <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
     
     /* Fuente global */
@@ -270,9 +270,9 @@ def apply_theme_styles(theme):
     .stMarkdown {{
         color: {colors['text']};
     }}
-    </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+    # minificado + hash una vez por tema; se inyecta una sola vez por sesión
+    themes.inject(themes.make_bundle(f"app_ui-{theme}", css), slot="bravo-app-ui")
 
 def ui_header():
     st.markdown("### This is Bravo · Cotizador de propuestas")
@@ -357,6 +357,20 @@ def render_edit_block(mod_levels):
             mods["E"] = e_lvl
     return mods
 
+def _quote_key(brief, params):
+    # misma cotización = mismo brief para el mismo cliente; otro cliente o tipo es otra cotización
+    return (brief, params["cliente_nombre"], params["cliente_tipo"])
+
+def _saved_quote_id(brief, params):
+    # id de la cotización ya guardada en la sesión para este brief y cliente (las ediciones son revisiones)
+    if st.session_state.get("ui_quote_key") == _quote_key(brief, params):
+        return st.session_state.get("ui_quote_id")
+    return None
+
+def _remember_quote(qid, brief, params):
+    st.session_state["ui_quote_id"] = qid
+    st.session_state["ui_quote_key"] = _quote_key(brief, params)
+
 def main():
     _init_db()
     catalog = _catalog()
@@ -405,18 +419,37 @@ def main():
                     st.info(f"Recalculo: Base USD {money(base2)} → Ajustado USD {money(adj2)}")
                     escenarios2 = render_result_cards(catalog, adj2)
                     if st.button("Guardar cotización (versión editada)"):
-                        qid = save_quote(
-                            params["cliente_nombre"], params["cliente_tipo"], brief,
-                            edited, base2, adj2, escenarios2, coefs2
+                        # la detección automática es la raíz; la edición se guarda como revisión (delta)
+                        qid = _saved_quote_id(brief, params)
+                        if qid is None:
+                            qid = save_quote(
+                                params["cliente_nombre"], params["cliente_tipo"], brief,
+                                mod_levels, base_usd, adjusted_usd, escenarios, coefs
+                            )
+                            _remember_quote(qid, brief, params)
+                        rev = save_revision(
+                            qid, cliente_nombre=params["cliente_nombre"], cliente_tipo=params["cliente_tipo"],
+                            mod_levels=edited, base_usd=base2, adjusted_usd=adj2,
+                            escenarios=escenarios2, coefs=coefs2,
                         )
-                        st.success(f"Guardado (# {qid})")
+                        st.success(f"Guardado (# {qid} · rev {rev})")
                 else:
                     if st.button("Guardar cotización (detección automática)"):
-                        qid = save_quote(
-                            params["cliente_nombre"], params["cliente_tipo"], brief,
-                            mod_levels, base_usd, adjusted_usd, escenarios, coefs
-                        )
-                        st.success(f"Guardado (# {qid})")
+                        qid = _saved_quote_id(brief, params)
+                        if qid is None:
+                            qid = save_quote(
+                                params["cliente_nombre"], params["cliente_tipo"], brief,
+                                mod_levels, base_usd, adjusted_usd, escenarios, coefs
+                            )
+                            _remember_quote(qid, brief, params)
+                            st.success(f"Guardado (# {qid})")
+                        else:
+                            rev = save_revision(
+                                qid, cliente_nombre=params["cliente_nombre"], cliente_tipo=params["cliente_tipo"],
+                                mod_levels=mod_levels, base_usd=base_usd, adjusted_usd=adjusted_usd,
+                                escenarios=escenarios, coefs=coefs,
+                            )
+                            st.success(f"Guardado (# {qid} · rev {rev})")
 
             if params["debug"]:
                 with st.expander("Debug (oculto por defecto)"):
@@ -430,10 +463,11 @@ def main():
         else:
             import pandas as pd, json
             data = []
-            for (qid, ts, cname, ctype, base_usd, adj_usd, esc, mods) in rows:
+            for (qid, ts, cname, ctype, base_usd, adj_usd, esc, mods, rev) in rows:
                 esc_d = json.loads(esc)
                 data.append({
                     "ID": qid,
+                    "Rev": rev,
                     "Fecha": ts,
                     "Cliente": cname or "(s/d)",
                     "Tipo": ctype,
@@ -445,11 +479,21 @@ def main():
                 })
             st.dataframe(pd.DataFrame(data))
 
+            revisadas = [r[0] for r in rows if r[8]]
+            if revisadas:
+                with st.expander("Revisiones de una cotización"):
+                    qsel = st.selectbox("Cotización", revisadas, key="hist_quote_id")
+                    st.dataframe(pd.DataFrame(
+                        [{"Rev": rev, "Fecha": ts, "Cambios": json.dumps(delta, ensure_ascii=False)}
+                         for rev, ts, delta in quote_history(qsel)]
+                    ))
+
             st.markdown("#### Indicadores rápidos")
-            df = pd.DataFrame(data)
-            st.write(f"- Cotizaciones guardadas: **{len(df)}**")
-            if len(df):
-                st.write(f"- Ticket medio (Lógico): **USD {df['Lógico USD'].mean():.2f}**")
+            total = read_stats("total", source=STATS_LOCAL)
+            n_total, sum_logico = (total[0][1], total[0][3]) if total else (0, 0.0)
+            st.write(f"- Cotizaciones guardadas: **{n_total}**")
+            if n_total:
+                st.write(f"- Ticket medio (Lógico): **USD {sum_logico / n_total:.2f}**")
 
     with tabs[2]:
         st.subheader("Catálogo (resumen)")
@@ -0,0 +1,80 @@
+# asset_store.py — directorio administrado para archivos auxiliares del PDF (footer HTML)
+# Los archivos se nombran por hash de contenido: el mismo footer se escribe una sola vez y se
+# reusa entre cotizaciones. sweep() borra lo viejo (por edad) y, si el directorio supera el
+# tope de tamaño, lo menos usado primero. Se llama al arrancar la app / CLI / API.
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+ASSET_DIR = "tmp_assets"
+MAX_AGE_SECONDS = 7 * 86400
+MAX_BYTES = 20 * 1024 * 1024
+
+class AssetStore:
+    def __init__(self, path: str = ASSET_DIR, max_age: float = MAX_AGE_SECONDS,
+                 max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.max_age = float(max_age)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+
+    def put(self, prefix: str, content: str, suffix: str = ".html") -> Path:
+        """Devuelve la ruta de `content` en el directorio, escribiéndolo solo si no existe."""
+        digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        target = self.path / f"{prefix}-{digest}{suffix}"
+        with self._lock:
+            if target.exists():
+                os.utime(target)  # marca de uso: el sweep por tamaño borra lo menos usado
+                return target
+            self.path.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f".{prefix}-", suffix=suffix, dir=self.path)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    fh.write(content)
+                os.replace(tmp, target)  # atómico: otro proceso nunca ve un archivo a medias
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        return target
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Borra archivos vencidos y recorta el directorio a max_bytes. Devuelve cuántos borró."""
+        if not self.path.is_dir():
+            return 0
+        now = time.time() if now is None else now
+        files = []
+        for p in self.path.iterdir():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if p.is_file():
+                files.append((st.st_mtime, st.st_size, p))
+        removed = 0
+        total = 0
+        for mtime, size, p in sorted(files, reverse=True):  # más recientes primero
+            if now - mtime > self.max_age or total + size > self.max_bytes:
+                try:
+                    p.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+                continue
+            total += size
+        return removed
+
+_default_store: Optional[AssetStore] = None
+
+def default_store() -> AssetStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = AssetStore()
+    return _default_store
@@ -0,0 +1,232 @@
+# bench.py — benchmark del render de cotizaciones contra budgets guardados (golden file)
+# Renderiza un set fijo de contextos (los CASES de regression.py, escenario Lógico)
+# con render_quote_html / render_quote_footer_html y, opcionalmente, a PDF.
+#
+#   python bench.py                 # compara contra bench_budgets.json; exit 1 si se pasa
+#   python bench.py --pdf           # incluye el paso wkhtmltopdf (si está instalado)
+#   python bench.py --update [--pdf]  # regraba los budgets con la medición actual
+#
+# Por paso se mide: ms por render (mejor tanda por contexto, promediado), pico de memoria
+# (tracemalloc, en una pasada aparte para no inflar los tiempos) y bytes promedio de salida.
+# Los ms dependen de la máquina y son solo informativos. El budget de tiempo es `rel`:
+# ms del paso / ms de una carga de calibración fija medida en la misma corrida, así que
+# el mismo budget vale en la notebook y en CI. Memoria y bytes son deterministas.
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from quote_core import (
+    SCENARIO_LABELS, build_quote_context, load_catalog_file, quote_brief,
+    render_pdf, render_quote_footer_html, render_quote_html,
+)
+from regression import CASES, params_from_inputs
+from tenants import DEFAULT_STUDIO
+
+BUDGETS_PATH = "bench_budgets.json"
+DEFAULT_TOLERANCE_PCT = 25.0        # memoria
+DEFAULT_RATIO_TOLERANCE_PCT = 50.0  # tiempo relativo a la calibración (sigue siendo ruidoso)
+DEFAULT_SIZE_TOLERANCE_PCT = 10.0   # tamaño de salida
+BENCH_RATE = 4000.0                # tasa fija: el contexto no depende de la red
+REPEATS = 5
+
+def bench_contexts(catalog: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Contextos deterministas a partir de CASES (cliente = nombre del caso)."""
+    ctxs = []
+    for name, brief in CASES.items():
+        result = quote_brief(catalog, brief, params_from_inputs({}))
+        q = {"cliente_nombre": name, "brief": brief,
+             "mod_weights": result.get("modulos_pesos", {}), "coefs": result.get("coefs", {})}
+        ctxs.append(build_quote_context(q, SCENARIO_LABELS["logico"],
+                                        result["scenarios"]["logico"], BENCH_RATE))
+    return ctxs
+
+def _footer(ctx: Dict[str, Any]) -> str:
+    return render_quote_footer_html(
+        estudio_nombre=ctx.get("estudio_nombre", DEFAULT_STUDIO.nombre),
+        estudio_web=ctx.get("estudio_web", DEFAULT_STUDIO.web),
+        estudio_mail=ctx.get("estudio_mail", DEFAULT_STUDIO.mail),
+    )
+
+STEPS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "html": lambda ctx: render_quote_html(**ctx),
+    "footer": _footer,
+    "pdf": render_pdf,
+}
+
+def _calibration() -> str:
+    # carga fija del mismo tipo que un render (formateo de montos + armado de strings)
+    rows = [f"<tr><td>{i}</td><td>USD {i * 37.5:,.2f}</td></tr>" for i in range(150)]
+    return "".join(rows).replace("<td>", '<td class="c">')
+
+def calibrate(iterations: int = 20) -> float:
+    """ms por vuelta de la carga de calibración (mejor de REPEATS tandas)."""
+    _calibration()
+    times = []
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            _calibration()
+        times.append((time.perf_counter() - t0) * 1000 / iterations)
+    return min(times)
+
+def _size(out: Any) -> int:
+    return len(out.encode("utf-8")) if isinstance(out, str) else len(out)
+
+def measure_step(fn: Callable[[Dict[str, Any]], Any], ctxs: List[Dict[str, Any]],
+                 iterations: int = 20) -> Dict[str, float]:
+    for ctx in ctxs:  # warmup (carga de templates, imports perezosos)
+        fn(ctx)
+    # como timeit.repeat: por contexto, REPEATS tandas de `iterations` renders; se toma
+    # la mejor tanda (lo menos ruidoso) y se promedia entre contextos
+    best: List[float] = []
+    sizes: List[int] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # como timeit: sin pausas del GC dentro de la medición
+    try:
+        for ctx in ctxs:
+            times = []
+            for _ in range(REPEATS if iterations > 1 else 1):
+                t0 = time.perf_counter()
+                for _ in range(iterations):
+                    out = fn(ctx)
+                times.append((time.perf_counter() - t0) * 1000 / iterations)
+            best.append(min(times))
+            sizes.append(_size(out))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    peak = 0
+    tracemalloc.start()
+    try:
+        for ctx in ctxs:
+            tracemalloc.reset_peak()
+            fn(ctx)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms": round(statistics.mean(best), 4),
+        "peak_kb": round(peak / 1024, 1),
+        "bytes": round(statistics.mean(sizes)),
+    }
+
+def run_bench(catalog: Dict[str, Any], with_pdf: bool = False, iterations: int = 20) -> Dict[str, Dict[str, float]]:
+    ctxs = bench_contexts(catalog)
+    steps = ["html", "footer"] + (["pdf"] if with_pdf else [])
+    out = {}
+    for s in steps:
+        # calibración pegada a cada paso (mismo estado de CPU); el PDF tarda segundos: una pasada
+        calib = calibrate(iterations)
+        m = measure_step(STEPS[s], ctxs, 1 if s == "pdf" else iterations)
+        calib = min(calib, calibrate(iterations))
+        out[s] = {**m, "rel": round(m["ms"] / calib, 3)}
+    return out
+
+def _best(a: Dict[str, Dict[str, float]], b: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {s: {k: min(v, b[s][k]) for k, v in m.items()} for s, m in a.items()}
+
+def compare(measured: Dict[str, Dict[str, float]], budgets: Dict[str, Any],
+            tolerance_pct: Optional[float] = None,
+            size_tolerance_pct: Optional[float] = None,
+            ratio_tolerance_pct: Optional[float] = None) -> List[str]:
+    """Lista de budgets excedidos (vacía = OK). Pasos sin budget no fallan; los ms no se chequean."""
+    tol = tolerance_pct if tolerance_pct is not None else float(budgets.get("tolerance_pct", DEFAULT_TOLERANCE_PCT))
+    ratio_tol = (ratio_tolerance_pct if ratio_tolerance_pct is not None
+                 else float(budgets.get("ratio_tolerance_pct", DEFAULT_RATIO_TOLERANCE_PCT)))
+    size_tol = (size_tolerance_pct if size_tolerance_pct is not None
+                else float(budgets.get("size_tolerance_pct", DEFAULT_SIZE_TOLERANCE_PCT)))
+    fails = []
+    for step, m in measured.items():
+        b = budgets.get("steps", {}).get(step)
+        if not b:
+            continue
+        for metric, pct in (("rel", ratio_tol), ("peak_kb", tol), ("bytes", size_tol)):
+            if metric in b and m[metric] > float(b[metric]) * (1 + pct / 100):
+                fails.append(f"{step}.{metric}: {m[metric]} > {b[metric]} (+{pct:g}%)")
+    return fails
+
+def load_budgets(path: str = BUDGETS_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+def save_budgets(measured: Dict[str, Dict[str, float]], path: str = BUDGETS_PATH,
+                 previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    prev = previous or {}
+    steps = dict(prev.get("steps", {}))
+    steps.update(measured)  # --update sin --pdf conserva el budget de PDF anterior
+    data = {
+        "updated": datetime.now().isoformat(timespec="seconds"),
+        "tolerance_pct": prev.get("tolerance_pct", DEFAULT_TOLERANCE_PCT),
+        "ratio_tolerance_pct": prev.get("ratio_tolerance_pct", DEFAULT_RATIO_TOLERANCE_PCT),
+        "size_tolerance_pct": prev.get("size_tolerance_pct", DEFAULT_SIZE_TOLERANCE_PCT),
+        "steps": steps,
+    }
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+        fh.write("\n")
+    return data
+
+def _pdf_available() -> bool:
+    try:
+        import pdfkit
+        from quote_core import _pdfkit_config
+        return isinstance(_pdfkit_config(), pdfkit.configuration.Configuration)
+    except Exception:
+        return False
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark del render de cotizaciones vs budgets.")
+    ap.add_argument("--catalog", default="catalog.json")
+    ap.add_argument("--budgets", default=BUDGETS_PATH)
+    ap.add_argument("--pdf", action="store_true", help="Incluir wkhtmltopdf")
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--tolerance", type=float, help="%% de tolerancia en memoria (default: el del archivo)")
+    ap.add_argument("--ratio-tolerance", type=float, help="%% de tolerancia en tiempo relativo (rel)")
+    ap.add_argument("--size-tolerance", type=float, help="%% de tolerancia en tamaño")
+    ap.add_argument("--update", action="store_true", help="Regrabar los budgets con esta medición")
+    ap.add_argument("--retries", type=int, default=2, help="Re-mediciones ante un exceso")
+    args = ap.parse_args(argv)
+
+    with_pdf = args.pdf
+    if with_pdf and not _pdf_available():
+        print("wkhtmltopdf no disponible: se omite el paso pdf", file=sys.stderr)
+        with_pdf = False
+
+    catalog = load_catalog_file(args.catalog)
+    iterations = max(1, args.iterations)
+    budgets = load_budgets(args.budgets)
+    measured = run_bench(catalog, with_pdf, iterations)
+    # los tiempos de sub-milisegundo son ruidosos: ante un exceso (o al regrabar) se
+    # re-mide y se queda el mejor valor por métrica
+    runs = 1
+    while runs <= args.retries and (args.update or compare(measured, budgets, args.tolerance, args.size_tolerance,
+                                                           args.ratio_tolerance)):
+        measured = _best(measured, run_bench(catalog, with_pdf, iterations))
+        runs += 1
+
+    for step, m in measured.items():
+        b = budgets.get("steps", {}).get(step, {})
+        print(f"{step:<7} {m['ms']:>9.3f} ms  {m['rel']:>7.3f}× calib  {m['peak_kb']:>8.1f} KB pico  {m['bytes']:>8} bytes"
+              + (f"   (budget {b.get('rel')}× / {b.get('peak_kb')} KB / {b.get('bytes')} bytes)" if b else "   (sin budget)"))
+
+    if args.update:
+        save_budgets(measured, args.budgets, budgets)
+        print(f"Budgets actualizados en {args.budgets}")
+        return 0
+    fails = compare(measured, budgets, args.tolerance, args.size_tolerance, args.ratio_tolerance)
+    for f in fails:
+        print(f"EXCEDIDO  {f}")
+    return 1 if fails else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
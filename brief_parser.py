@@ -1,9 +1,18 @@
 # brief_parser.py — versión unificada y optimizada para producción
 # Mantiene compatibilidad con detect_module_weights(...) y debug_parse(...)
 
+import json
+import logging
 import re
+import threading
+import time
 import unicodedata
-from typing import Dict, Any, List, Optional
+from pathlib import Path
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
 
 # Biblioteca consolidada de entregables por módulo (A–E) y nivel
 # A: Research | B: Brand DNA | C: Creación | D: Brandbook | E: Implementación
@@ -95,18 +104,169 @@ DELIVERABLES = {
     },
 }
 
+# ============================================================================
+# NIVELES E ÍNDICE DE ENTREGABLES
+# ============================================================================
+# Una sola tabla peso → etiqueta (la que se muestra) y etiqueta → nivel de entregables.
+# La usan quote_core (HTML/PDF), pricing.explain y el resumen de app.py.
+
+LEVEL_LABELS = MappingProxyType({
+    1.0: "full", 0.8: "rebranding", 0.65: "lite", 0.6: "lite", 0.5: "refresh", 1.5: "plus",
+})
+_LABEL_TIER = {"plus": "plus", "full": "full", "rebranding": "full", "refresh": "lite", "lite": "lite"}
+_TIERS = ("lite", "full", "plus")
+_NON_CUMULATIVE = frozenset({"D"})  # Brandbook: cada nivel trae su propia lista
+
+def level_label(weight: Any) -> str:
+    """Etiqueta legible del nivel ('full', 'rebranding', ...) o '<peso>×' si no es estándar."""
+    w = float(weight)
+    return LEVEL_LABELS.get(round(w, 2), f"{w}×")
+
+def level_tier(label: str) -> str:
+    """Nivel de entregables ('lite' | 'full' | 'plus') para una etiqueta de level_label."""
+    label = str(label or "").lower()
+    return _LABEL_TIER.get(label, "full" if "×" in label else "lite")
+
+def _canon_deliverable(txt: str) -> str:
+    t = re.sub(r"\s*\([^)]*\)", "", txt)   # quita lo entre paréntesis
+    t = t.strip().rstrip(".")
+    return re.sub(r"\s+", " ", t).lower()
+
+def _build_deliverables_index() -> "MappingProxyType[Tuple[str, str], Tuple[str, ...]]":
+    index: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+    for mod, por_nivel in DELIVERABLES.items():
+        acumulados: List[str] = []
+        for tier in _TIERS:
+            if mod in _NON_CUMULATIVE:
+                index[(mod, tier)] = tuple(por_nivel.get(tier, []))
+                continue
+            items = por_nivel.get(tier) or (por_nivel.get("lite", []) if tier == "full" else [])
+            acumulados.extend(items)
+            vistos, unicos = set(), []
+            for e in acumulados:
+                k = _canon_deliverable(e)
+                if k not in vistos:
+                    vistos.add(k)
+                    unicos.append(e)
+            index[(mod, tier)] = tuple(unicos)
+    return MappingProxyType(index)
+
+# (módulo, nivel) → entregables acumulados y sin duplicados; se arma una vez al importar
+DELIVERABLES_INDEX = _build_deliverables_index()
+
+def deliverables_for(mod: str, weight: Any) -> Tuple[str, ...]:
+    return DELIVERABLES_INDEX.get((mod, level_tier(level_label(weight))), ())
+
 # ============================================================================
 # NORMALIZACIÓN Y UTILIDADES BASE
 # ============================================================================
 
+# Tabla variante → forma canónica. Los patrones de parser_rules.json se escriben
+# contra la forma canónica ("pieza" cubre piezas, "completo" cubre completa/os/as,
+# "rediseno" cubre rediseñar/rediseñamos/rediseños), así no enumeran inflexiones.
+# Sustantivos: plural regular. Adjetivos: género y número. Verbos en -ar: formas
+# comunes, mapeadas al sustantivo que usan los patrones.
+_STEM_NOUNS = (
+    "pieza", "aplicacion", "adaptacion", "ajuste", "competidor",
+    "territorio", "tendencia", "plantilla", "template", "presentacion", "manual", "guia",
+    "logo", "logotipo", "isologo", "imagotipo", "simbolo", "tagline", "arquetipo", "valor",
+    "principio", "audiencia", "campana", "evento", "sitio", "rediseno", "actualizacion",
+    "modernizacion", "brochure", "sistema",
+)
+# "insight" no: "insights" (A) e "insight del consumidor" (B full) son señales distintas
+_STEM_LOANWORDS = ("post", "banner", "slogan", "claim", "brandbook")  # plural +s
+_STEM_ADJECTIVES = (
+    "completo", "basico", "simple", "rapido", "detallado", "profundo", "integral", "extenso",
+    "avanzado", "reducido", "abreviado", "minimo", "esencial", "principal", "menor",
+    "pequeno", "masivo", "extendido", "grande", "inicial", "simplificado", "visual",
+)
+_STEM_VERBS = {"redisen": "rediseno", "actualiz": "actualizacion", "moderniz": "modernizacion"}
+_AR_ENDINGS = ("ar", "o", "a", "as", "an", "amos", "e", "en", "emos", "ado", "ada", "ados",
+               "adas", "ando", "aremos", "aria", "arian")
+
+def _plural(w: str) -> str:
+    if w[-1] in "aeiou":
+        return w + "s"
+    if w.endswith("z"):
+        return w[:-1] + "ces"
+    return w + "es"
+
+def _build_stems() -> Dict[str, str]:
+    table: Dict[str, str] = {}
+    for n in _STEM_NOUNS:
+        table[_plural(n)] = n
+    for n in _STEM_LOANWORDS:
+        table[n + "s"] = n
+    for adj in _STEM_ADJECTIVES:
+        forms = [adj + "s"] if adj[-1] in "aeiou" else [_plural(adj)]
+        if adj.endswith("o"):
+            forms += [adj[:-1] + "a", adj[:-1] + "as", adj + "s"]
+        for f in forms:
+            table[f] = adj
+    for root, canon in _STEM_VERBS.items():
+        for end in _AR_ENDINGS:
+            form = root + end
+            if root.endswith("z") and end[0] == "e":  # actualice, modernicen
+                form = root[:-1] + "c" + end
+            table[form] = canon
+    canon = set(table.values())
+    for form in list(table):
+        if form in canon:  # una forma canónica nunca se reescribe (normalizar es idempotente)
+            del table[form]
+    return table
+
+STEMS = MappingProxyType(_build_stems())
+_STEM_RE = re.compile(r"\b(?:" + "|".join(sorted(STEMS, key=len, reverse=True)) + r")\b")
+
+def _stem_word(m: "re.Match") -> str:
+    return STEMS[m.group(0)]
+
 def _normalize(txt: Any) -> str:
-    """Lower, sin tildes, espacios colapsados; tolerante a None."""
+    """Lower, sin tildes, espacios colapsados y variantes llevadas a su forma canónica (STEMS)."""
     if not isinstance(txt, str):
         txt = str(txt or "")
     nfd = unicodedata.normalize("NFD", txt)
     s = "".join(c for c in nfd if unicodedata.category(c) != "Mn")
     s = re.sub(r"\s+", " ", s.lower()).strip()
-    return s
+    return _STEM_RE.sub(_stem_word, s)
+
+def _normalize_with_offsets(txt: Any) -> Tuple[str, List[int], List[int]]:
+    """
+    Igual que _normalize, más el mapa de cada carácter normalizado a su rango en el
+    original: el carácter i sale de txt[starts[i]:ends[i]]. Solo para resaltar spans.
+    """
+    if not isinstance(txt, str):
+        txt = str(txt or "")
+    chars: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    for i, c in enumerate(txt):
+        for d in unicodedata.normalize("NFD", c):
+            if unicodedata.category(d) == "Mn":
+                continue
+            for low in d.lower():
+                if low.isspace():
+                    if not chars or chars[-1] == " ":
+                        if chars:
+                            ends[-1] = i + 1  # el espacio colapsado cubre toda la corrida
+                        continue
+                    low = " "
+                chars.append(low)
+                starts.append(i)
+                ends.append(i + 1)
+    if chars and chars[-1] == " ":
+        del chars[-1], starts[-1], ends[-1]
+    s = "".join(chars)
+    # variantes → forma canónica: cada carácter de la forma canónica apunta a la palabra original
+    out, o_starts, o_ends, last = [], [], [], 0
+    for m in _STEM_RE.finditer(s):
+        a, b = m.span()
+        out.append(s[last:a]); o_starts += starts[last:a]; o_ends += ends[last:a]
+        canon = STEMS[m.group(0)]
+        out.append(canon); o_starts += [starts[a]] * len(canon); o_ends += [ends[b - 1]] * len(canon)
+        last = b
+    out.append(s[last:]); o_starts += starts[last:]; o_ends += ends[last:]
+    return "".join(out), o_starts, o_ends
 
 def _negated_present(text: str, kw: str, window: int = 4) -> bool:
     """
@@ -128,147 +288,250 @@ def _add_reason(reasons: List[str], msg: str) -> None:
     if msg not in reasons:
         reasons.append(msg)
 
-def _count_pattern_matches(text: str, patterns: List[str]) -> int:
-    return sum(1 for p in patterns if re.search(p, text, re.IGNORECASE))
+# (grupo de reglas, índice del patrón/keyword, start, end) en el texto normalizado
+Hit = Tuple[str, int, int, int]
+
+def _count_pattern_matches(text: str, patterns: Tuple["re.Pattern", ...],
+                           hits: Optional[List[Hit]] = None, group: str = "") -> int:
+    """Cuántos patrones matchean; con `hits`, anota (grupo, índice, start, end) de cada match."""
+    n = 0
+    for i, p in enumerate(patterns):
+        m = p.search(text)
+        if m:
+            n += 1
+            if hits is not None:
+                hits.append((group, i, m.start(), m.end()))
+    return n
+
+def _keyword_hits(text: str, kws: Tuple[str, ...], hits: Optional[List[Hit]],
+                  group: str, negatable: bool = False, first: bool = False) -> int:
+    """Keywords presentes (substring, como `kw in text`), anotando su posición en `hits`."""
+    n = 0
+    for i, kw in enumerate(kws):
+        pos = text.find(kw)
+        if pos < 0 or (negatable and _negated_present(text, kw)):
+            continue
+        n += 1
+        if hits is not None:
+            hits.append((group, i, pos, pos + len(kw)))
+        if first:
+            break
+    return n
 
 # ============================================================================
-# KEYWORDS / PATRONES POR MÓDULO
+# CANTIDADES: un solo scan con todas las menciones (número, unidad, operador)
 # ============================================================================
 
-# A: Research (1.0)
-PATTERNS_A = [
-    r"\b(research|investigacion|auditoria)\b",
-    r"\b(benchmark|competencia|competidores?)\b",
-    r"\b(analisis\s+de\s+(audiencia|mercado)|insights?)\b",
-    r"\b(estudio\s+de\s+marca|desk\s+research|tendencias)\b",
-]
-
-# B: Brand DNA — lite (0.65) vs full (1.0)
-PATTERNS_B_FULL = [
-    r"\b(brand\s+dna|adn(\s+de\s+marca)?)\s*(completo|full|detallado|profundo|integral)?\b",
-    r"\b(territorios?\s+de\s+marca|arquetipo)\b",
-    r"\b(storytelling|narrativa\s+(de\s+marca|profunda))\b",
-    r"\b(estrategia\s+(completa|profunda|integral|de\s+marca\s+completa))\b",
-    r"\b(manifiesto\s+(completo|detallado|de\s+marca))\b",
-    r"\b(valores\s+y\s+principios|personalidad\s+de\s+marca)\b",
-    r"\b(insight\s+del\s+consumidor|concepto\s+de\s+marca)\b",
-    r"\b(proposito\s+y\s+valores|dna\s+estrategico)\b",
-]
-KW_B_LITE_HINTS = [
-    "adn lite", "estrategia basica", "adn basico",
-    "proposito y personalidad", "manifiesto simple",
-    "resumen accionable", "sintesis", "enfoque sintesis",
-    "estrategia rapida", "adn de marca basico", "brand dna basico",
-]
-
-# C: Creación — refresh (0.5) / rebranding (0.8) / full (1.0)
-PATTERNS_C_REFRESH = [
-    r"\b(refresh|actualizacion|modernizacion)\b",
-    r"\b(ajuste(s)?\s+(menor(es)?|de\s+marca|de\s+identidad))\b",
-    r"\b(puesta\s+a\s+punto|refresco)\b",
-]
-PATTERNS_C_REBRAND = [
-    r"\b(rebranding|re-branding|rebrand)\b",
-    r"\b(rediseno\s+total|cambio\s+de\s+identidad)\b",
-    r"\b(transformacion\s+de\s+marca|nueva\s+marca)\b",
-    r"\b(modernizacion\s+(completa|del\s+logo|de\s+marca))\b",
-]
-PATTERNS_C_FULL = [
-    r"\b(identidad\s+(completa|full|integral))\b",
-    r"\b(logo\s+([ye+]|y)\s+(naming|identidad))\b",
-    r"\b(naming\s+([ye+]|y)\s+logo)\b",
-    r"\b(sistema\s+visual\s+completo)\b",
-]
-PATTERNS_C_NAMING  = [r"\b(naming|nombre\s+de\s+marca|claim|tagline|slogan)\b"]
-PATTERNS_C_LOGO    = [r"\b(logo|logotipo|isologo|imagotipo|iso|simbolo)\b"]
-PATTERNS_C_CONCEPTO= [r"\b(concepto\s+creativo|territorio\s+creativo)\b"]
-
-# D: Brandbook — lite (0.6) / full (1.0)
-PATTERNS_D_FULL = [
-    r"\b(manual\s+(completo|full|detallado|extenso|avanzado|integral))\b",
-    r"\b(brandbook\s+(completo|full|integral))\b",
-    r"\b(guia\s+(completa|avanzada|integral|de\s+marca\s+completa))\b",
-    r"\b(manual\s+de\s+identidad\s+(completo|full|integral))\b",
-    r"\b(sistema\s+visual\s+(completo|extenso|integral))\b",
-    r"\b(arquitectura\s+de\s+marca)\b",
-]
-PATTERNS_D_LITE = [
-    r"\b(manual\s+(lite|basico|simple|reducido|abreviado|rapido))\b",
-    r"\b(brandbook\s+(lite|basico|esencial|simple))\b",
-    r"\b(guia\s+(rapida|basica|simple|essencial))\b",
-    r"\b(mini\s+manual|version\s+simplificada)\b",
-    r"\b(guia\s+de\s+marca\s+(basica|simple|lite))\b",
-    r"\b(manual\s+de\s+marca\s+(lite|basico|simple|reducido))\b",
-]
-KW_D_GENERIC = ["brandbook", "manual de marca", "manual", "guia de marca", "manual de identidad", "sistema visual"]
-
-# E: Implementación — lite (0.6) / full (1.0) / plus (1.5)
-KW_E_GENERIC = [
-    "implementacion", "aplicaciones", "piezas", "pack",
-    "lanzamiento", "template", "plantilla", "presentacion",
-    "brochure", "banner", "papeleria", "posts", "redes",
-    "sitio", "web", "packaging", "evento", "adaptaciones",
-    "rrss", "banners",
-]
-PATTERNS_E_LITE = [
-    r"\b(piezas?\s+basicas?|aplicaciones?\s+minimas?)\b",
-    r"\b(pack\s+(pequeno|basico|inicial))\b",
-    r"\b(adaptaciones?\s+esenciales?)\b",
-]
-PATTERNS_E_FULL = [
-    r"\b(pack\s+(estandar|medio|completo))\b",
-    r"\b(lanzamiento\s+estandar)\b",
-    r"\b(aplicaciones?\s+principales?)\b",
-]
-PATTERNS_E_PLUS = [
-    r"\b(pack\s+(grande|premium|extendido))\b",
-    r"\b(campana|lanzamiento\s+(integral|masivo|completo))\b",
-    r"\b(implementacion\s+(completa|extensa))\b",
-    r"\b(evento\s+de\s+lanzamiento)\b",
-]
-RANGO_E_LITE_MAX = 10
-RANGO_E_FULL_MAX = 15
+# Números escritos (texto ya normalizado). "un/una/uno" quedan afuera: son artículos.
+_NUM_WORDS = {
+    "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7, "ocho": 8,
+    "nueve": 9, "diez": 10, "once": 11, "doce": 12, "trece": 13, "catorce": 14,
+    "quince": 15, "dieciseis": 16, "diecisiete": 17, "dieciocho": 18, "diecinueve": 19,
+    "veinte": 20, "veintiun": 21, "veintiuno": 21, "veintiuna": 21, "veintidos": 22,
+    "veintitres": 23, "veinticuatro": 24, "veinticinco": 25, "veintiseis": 26,
+    "veintisiete": 27, "veintiocho": 28, "veintinueve": 29, "treinta": 30,
+    "cuarenta": 40, "cincuenta": 50, "cien": 100, "docena": 12,
+}
+_NUM_UNITS = ("uno", "una", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve")
+_NUM_SRC = (r"\d+|(?:treinta|cuarenta|cincuenta)\s+y\s+(?:" + "|".join(_NUM_UNITS) + r")\b|(?:"
+            + "|".join(sorted(_NUM_WORDS, key=len, reverse=True)) + r")\b")
+
+# Unidades que cuentan como piezas de implementación (formas canónicas de STEMS) y
+# unidades que no (un "hasta 3 semanas" no es una cantidad de piezas)
+PIECE_UNITS = frozenset({"pieza", "post", "banner", "aplicacion", "adaptacion"})
+_OTHER_UNITS = frozenset({
+    "semana", "semanas", "dia", "dias", "mes", "meses", "hora", "horas", "ano", "anos",
+    "slide", "slides", "pagina", "paginas", "idioma", "idiomas", "version", "versiones",
+    "persona", "personas", "stakeholder", "stakeholders", "color", "colores", "opcion", "opciones",
+    "marca", "marcas", "competidor", "competidores", "empresa", "empresas", "cliente", "clientes",
+    "mercado", "mercados", "pais", "paises", "ciudad", "ciudades", "usuario", "usuarios",
+    "entrevista", "entrevistas", "idea", "ideas", "propuesta", "propuestas", "ronda", "rondas",
+})
+_OPS = r"hasta|mas\s+de|menos\s+de|al\s+menos|como\s+maximo|>=|<=|>|<"
+_QTY_RE = re.compile(
+    rf"\bentre\s+(?P<ea>{_NUM_SRC})\s+y\s+(?P<eb>{_NUM_SRC})(?:\s+(?:de\s+)?(?P<eu>[a-z]+))?"
+    rf"|(?P<pu>{'|'.join(sorted(PIECE_UNITS))})\s*(?:de|x|:)?\s*(?P<pn>\d+)\b"
+    rf"|(?:(?P<op>{_OPS})\s*)?\b(?P<a>{_NUM_SRC})(?:\s*(?:-|a|al)\s*(?P<b>{_NUM_SRC}))?"
+    rf"(?:\s+(?:de\s+)?(?P<u>[a-z]+))?"
+)
+
+@dataclass(frozen=True)
+class Quantity:
+    qty: int                  # valor resuelto (rango → punto medio, "más de 10" → 11)
+    unit: Optional[str]       # palabra siguiente (o anterior, en "piezas x 3"); None si no hay
+    op: Optional[str]         # "entre", "hasta", "mas de", ">", ...; None si es un número suelto
+    span: Tuple[int, int]     # posición en el texto normalizado
+    written: bool = False     # número escrito ("cinco"), no en cifras
+
+    @property
+    def is_pieces(self) -> bool:
+        """
+        Cuenta como piezas: unidad de pieza, o un operador con una cifra y sin otra unidad
+        ("hasta 10"). Un número escrito necesita unidad de pieza ("hasta cinco marcas" no).
+        """
+        if self.unit in PIECE_UNITS:
+            return True
+        if self.written:
+            return False
+        return self.op is not None and (self.unit is None or self.unit not in _OTHER_UNITS)
+
+def _num(txt: str) -> int:
+    if txt.isdigit():
+        return int(txt)
+    parts = txt.split()
+    if len(parts) == 3:  # "treinta y cinco"
+        return _NUM_WORDS[parts[0]] + (_NUM_WORDS.get(parts[2]) or 1)
+    return _NUM_WORDS[txt]
+
+def extract_quantities(t: str) -> List[Quantity]:
+    """Todas las cantidades de `t` (texto normalizado) en una sola pasada."""
+    out: List[Quantity] = []
+    for m in _QTY_RE.finditer(t):
+        g = m.groupdict()
+        if g["ea"]:
+            qty, op, unit = (_num(g["ea"]) + _num(g["eb"])) // 2, "entre", g["eu"]
+        elif g["pu"]:
+            qty, op, unit = int(g["pn"]), None, g["pu"]
+        else:
+            n = _num(g["a"])
+            op = re.sub(r"\s+", " ", g["op"]) if g["op"] else None
+            unit = g["u"]
+            if g["b"]:
+                qty, op = (n + _num(g["b"])) // 2, op or "rango"
+            elif op in ("mas de", ">"):
+                qty = n + 1
+            elif op in ("menos de", "<"):
+                qty = max(0, n - 1)
+            else:
+                qty = n
+        nums = [g[k] for k in ("ea", "eb", "a", "b") if g[k]]
+        out.append(Quantity(qty, unit, op, m.span(), any(not n.isdigit() for n in nums)))
+    return out
 
 # ============================================================================
-# DETECCIÓN E (Implementación) CON PARSER NUMÉRICO
+# REGLAS (parser_rules.json): patrones y keywords por módulo
 # ============================================================================
+# Los patrones / keywords viven en parser_rules.json (versionado). Se compilan una vez
+# por proceso y se recargan solos cuando el archivo cambia: rules() chequea el mtime
+# cada RELOAD_CHECK_SECONDS y, si cambió, compila el set nuevo completo y recién ahí lo
+# publica (swap atómico). Un archivo inválido se loguea y se sigue con el set anterior.
+
+RULES_PATH = Path(__file__).parent / "parser_rules.json"
+RULES_VERSION = 2  # 2: patrones escritos contra las formas canónicas de STEMS
+RELOAD_CHECK_SECONDS = 2.0
+
+# Negadores que consulta _negated_present (parte del código, no de las reglas)
+_NEGATORS = r"\b(sin|no|excluir|excepto|omitir)\b"
+
+# Señales por módulo para el parse incremental: (grupos de patrones, grupos de
+# keywords, regex extra). Todo lo que el detector del módulo consulta.
+_SIGNAL_GROUPS = {
+    "A": (("A",), (), ()),
+    "B": (("B_FULL",), ("B_LITE_HINTS",), (_NEGATORS,)),
+    "C": (("C_FULL", "C_REBRAND", "C_REFRESH", "C_NAMING", "C_LOGO", "C_CONCEPTO", "C_AJUSTE"), (),
+          (_NEGATORS, r"logo", r"identidad")),
+    "D": (("D_LITE", "D_FULL"), ("D_GENERIC",), (_NEGATORS, r"brandbook")),
+    "E": (("E_PLUS", "E_FULL", "E_LITE"), ("E_GENERIC",), (r"\d", r"[<>]", _NUM_SRC)),
+}
+
+def _signals(patterns: List[str], keywords: List[str] = ()) -> "re.Pattern":
+    alts = list(patterns) + [re.escape(k) for k in keywords]
+    return re.compile("|".join(f"(?:{p})" for p in alts), re.IGNORECASE)
+
+class ParserRules:
+    """Set de reglas compilado (inmutable una vez construido)."""
+
+    __slots__ = ("version", "patterns", "keywords", "ranges", "infer", "signals", "stamp")
+
+    def __init__(self, data: Dict[str, Any], stamp: Tuple[int, int] = (0, 0)):
+        version = data.get("version")
+        if version != RULES_VERSION:
+            raise ValueError(f"versión de reglas no soportada: {version!r} (se espera {RULES_VERSION})")
+        self.version = version
+        self.stamp = stamp
+        self.patterns: Dict[str, Tuple["re.Pattern", ...]] = {
+            name: tuple(re.compile(p, re.IGNORECASE) for p in pats)
+            for name, pats in data["patterns"].items()
+        }
+        # las keywords se llevan a la misma forma canónica que el texto
+        self.keywords: Dict[str, Tuple[str, ...]] = {
+            name: tuple(dict.fromkeys(_normalize(k) for k in kws)) for name, kws in data["keywords"].items()
+        }
+        self.ranges: Dict[str, int] = {k: int(v) for k, v in data["ranges"].items()}
+        self.infer = tuple(
+            (g["module"], tuple((float(r["weight"]), tuple(r["keywords"]), r["reason"]) for r in g["rules"]))
+            for g in data.get("infer", [])
+        )
+        self.signals: Dict[str, "re.Pattern"] = {
+            m: _signals(
+                [p.pattern for name in pat_groups for p in self.patterns[name]] + list(extra),
+                [k for name in kw_groups for k in self.keywords[name]],
+            )
+            for m, (pat_groups, kw_groups, extra) in _SIGNAL_GROUPS.items()
+        }
+
+def _rules_stamp(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+def load_rules(path: Path = RULES_PATH) -> ParserRules:
+    stamp = _rules_stamp(path)
+    with open(path, "r", encoding="utf-8") as fh:
+        return ParserRules(json.load(fh), stamp)
+
+_rules: Optional[ParserRules] = None
+_rules_checked = 0.0
+_rules_rejected: Optional[Tuple[int, int]] = None  # stamp de un archivo inválido ya logueado
+_rules_lock = threading.Lock()
+
+def rules() -> ParserRules:
+    """Reglas vigentes; recompila si parser_rules.json cambió desde la última carga."""
+    global _rules, _rules_checked, _rules_rejected
+    current = _rules
+    now = time.monotonic()
+    if current is not None and now - _rules_checked < RELOAD_CHECK_SECONDS:
+        return current
+    with _rules_lock:
+        if _rules is not None and _rules is not current:
+            return _rules  # otro hilo ya recargó
+        _rules_checked = now
+        stamp = None
+        try:
+            stamp = _rules_stamp(RULES_PATH)
+            if _rules is not None and stamp in (_rules.stamp, _rules_rejected):
+                return _rules
+            _rules = load_rules(RULES_PATH)
+        except Exception:
+            if _rules is None:
+                raise
+            _rules_rejected = stamp
+            log.exception("parser_rules.json inválido; se mantienen las reglas v%s", _rules.version)
+        return _rules
 
-def _parse_number_expr(text: str) -> Optional[int]:
-    t = _normalize(text)
-    m = re.search(r'\bentre\s+(\d+)\s+y\s+(\d+)\b', t)
-    if m:
-        a, b = int(m.group(1)), int(m.group(2))
-        return (a + b) // 2
-    m = re.search(r'\bhasta\s+(\d+)\b', t)
-    if m: return int(m.group(1))
-    m = re.search(r'\bmas\s+de\s+(\d+)\b', t)
-    if m: return int(m.group(1)) + 1
-    m = re.search(r'(>=|>|<=|<)\s*(\d+)', t)
-    if m:
-        op, num = m.group(1), int(m.group(2))
-        return num + 1 if op == '>' else num if op in ('>=','<=') else max(0, num - 1)
-    m = re.search(r'\b(\d+)\s*(adaptaciones?|piezas?|posts?|banners?|aplicaciones?)\b', t)
-    if m: return int(m.group(1))
-    m = re.search(r'\b(adaptaciones?|piezas?|posts?|banners?|aplicaciones?)\s*(de|x)?\s*(\d+)\b', t)
-    if m and m.lastindex and (m.group(m.lastindex) or "").isdigit():
-        return int(m.group(m.lastindex))
-    return None
-
-def _detect_impl_weight(text: str, reasons: List[str]) -> float:
-    t = _normalize(text)
-    qty = _parse_number_expr(t)
-    if isinstance(qty, int):
-        if qty <= RANGO_E_LITE_MAX:
-            _add_reason(reasons, f"E lite: {qty} piezas (≤{RANGO_E_LITE_MAX})")
+# ============================================================================
+# DETECCIÓN E (Implementación) POR CANTIDAD DE PIEZAS
+# ============================================================================
+
+def _detect_impl_weight(t: str, reasons: List[str], R: Optional[ParserRules] = None,
+                        hits: Optional[List[Hit]] = None) -> float:
+    R = R or rules()
+    piezas = [q for q in extract_quantities(t) if q.is_pieces]
+    lite_max, full_max = R.ranges["E_LITE_MAX"], R.ranges["E_FULL_MAX"]
+    if piezas:
+        qty = sum(q.qty for q in piezas)  # "5 piezas ... y 20 posts" → 25
+        if hits is not None:
+            hits.extend(("QTY", i, q.span[0], q.span[1]) for i, q in enumerate(piezas))
+        if qty <= lite_max:
+            _add_reason(reasons, f"E lite: {qty} piezas (≤{lite_max})")
             return 0.6
-        if qty <= RANGO_E_FULL_MAX:
-            _add_reason(reasons, f"E full: {qty} piezas ({RANGO_E_LITE_MAX+1}-{RANGO_E_FULL_MAX})")
+        if qty <= full_max:
+            _add_reason(reasons, f"E full: {qty} piezas ({lite_max+1}-{full_max})")
             return 1.0
-        _add_reason(reasons, f"E plus: {qty} piezas (>{RANGO_E_FULL_MAX})")
+        _add_reason(reasons, f"E plus: {qty} piezas (>{full_max})")
         return 1.5
-    sp = _count_pattern_matches(t, PATTERNS_E_PLUS)
-    sf = _count_pattern_matches(t, PATTERNS_E_FULL)
-    sl = _count_pattern_matches(t, PATTERNS_E_LITE)
+    sp = _count_pattern_matches(t, R.patterns["E_PLUS"], hits, "E_PLUS")
+    sf = _count_pattern_matches(t, R.patterns["E_FULL"], hits, "E_FULL")
+    sl = _count_pattern_matches(t, R.patterns["E_LITE"], hits, "E_LITE")
     if sp > 0:
         _add_reason(reasons, f"E plus: {sp} señales")
         return 1.5
@@ -278,7 +541,7 @@ def _detect_impl_weight(text: str, reasons: List[str]) -> float:
     if sl > 0:
         _add_reason(reasons, f"E lite: {sl} señales")
         return 0.6
-    if any(kw in t for kw in KW_E_GENERIC):
+    if _keyword_hits(t, R.keywords["E_GENERIC"], hits, "E_GENERIC", first=True):
         _add_reason(reasons, "E lite: implementación genérica sin detalle")
         return 0.6
     return 0.0
@@ -287,18 +550,20 @@ def _detect_impl_weight(text: str, reasons: List[str]) -> float:
 # DETECCIÓN POR MÓDULOS (A–D)
 # ============================================================================
 
-def _detect_module_a(raw_text: str, reasons: List[str]) -> float:
-    t = _normalize(raw_text)
-    score = _count_pattern_matches(t, PATTERNS_A)
+def _detect_module_a(t: str, reasons: List[str], R: Optional[ParserRules] = None,
+                     hits: Optional[List[Hit]] = None) -> float:
+    R = R or rules()
+    score = _count_pattern_matches(t, R.patterns["A"], hits, "A")
     if score > 0:
         _add_reason(reasons, f"A: Research ({score} señales)")
         return 1.0
     return 0.0
 
-def _detect_module_b(raw_text: str, reasons: List[str]) -> float:
-    t = _normalize(raw_text)
-    score_full = _count_pattern_matches(t, PATTERNS_B_FULL)
-    score_lite = sum(1 for kw in KW_B_LITE_HINTS if _has_keyword(t, kw))
+def _detect_module_b(t: str, reasons: List[str], R: Optional[ParserRules] = None,
+                     hits: Optional[List[Hit]] = None) -> float:
+    R = R or rules()
+    score_full = _count_pattern_matches(t, R.patterns["B_FULL"], hits, "B_FULL")
+    score_lite = _keyword_hits(t, R.keywords["B_LITE_HINTS"], hits, "B_LITE_HINTS", negatable=True)
     if score_lite >= 1:
         _add_reason(reasons, f"B lite: {score_lite} pistas explícitas")
         return 0.65
@@ -307,17 +572,18 @@ def _detect_module_b(raw_text: str, reasons: List[str]) -> float:
         return 1.0
     return 0.0
 
-def _detect_module_c(raw_text: str, reasons: List[str]) -> float:
-    t = _normalize(raw_text)
+def _detect_module_c(t: str, reasons: List[str], R: Optional[ParserRules] = None,
+                     hits: Optional[List[Hit]] = None) -> float:
+    R = R or rules()
     if _negated_present(t, "logo") and _negated_present(t, "identidad"):
         _add_reason(reasons, "C descartado: negación de logo e identidad")
         return 0.0
-    sf  = _count_pattern_matches(t, PATTERNS_C_FULL)
-    srb = _count_pattern_matches(t, PATTERNS_C_REBRAND)
-    srf = _count_pattern_matches(t, PATTERNS_C_REFRESH)
-    has_naming   = _count_pattern_matches(t, PATTERNS_C_NAMING)   > 0
-    has_logo     = _count_pattern_matches(t, PATTERNS_C_LOGO)     > 0
-    has_concepto = _count_pattern_matches(t, PATTERNS_C_CONCEPTO) > 0
+    sf  = _count_pattern_matches(t, R.patterns["C_FULL"], hits, "C_FULL")
+    srb = _count_pattern_matches(t, R.patterns["C_REBRAND"], hits, "C_REBRAND")
+    srf = _count_pattern_matches(t, R.patterns["C_REFRESH"], hits, "C_REFRESH")
+    has_naming   = _count_pattern_matches(t, R.patterns["C_NAMING"], hits, "C_NAMING")   > 0
+    has_logo     = _count_pattern_matches(t, R.patterns["C_LOGO"], hits, "C_LOGO")     > 0
+    has_concepto = _count_pattern_matches(t, R.patterns["C_CONCEPTO"], hits, "C_CONCEPTO") > 0
     comps = sum([has_naming, has_logo, has_concepto])
     if sf >= 2 or comps >= 2:
         _add_reason(reasons, f"C full: full={sf}, comps={comps}")
@@ -332,14 +598,15 @@ def _detect_module_c(raw_text: str, reasons: List[str]) -> float:
         _add_reason(reasons, f"C refresh: {srf} señales")
         return 0.5
     if has_logo or has_naming:
-        if re.search(r"\b(ajuste(s)?|puesta\s+a\s+punto)\b", t):
+        if _count_pattern_matches(t, R.patterns["C_AJUSTE"], hits, "C_AJUSTE"):
             _add_reason(reasons, "C refresh: componentes con 'ajuste'")
             return 0.5
         _add_reason(reasons, "C full: logo/naming sin calificador")
         return 1.0
     return 0.0
 
-def _detect_module_d(text: str, reasons: List[str]) -> float:
+def _detect_module_d(t: str, reasons: List[str], R: Optional[ParserRules] = None,
+                     hits: Optional[List[Hit]] = None) -> float:
     """
     Brandbook / Manual (D) – Reglas:
     1) Negación explícita → 0.0
@@ -347,23 +614,23 @@ def _detect_module_d(text: str, reasons: List[str]) -> float:
     3) Full con ≥1 señal fuerte → 1.0
     4) Genérico sin adjetivo → **1.0 (full)**
     """
-    t = _normalize(text)
+    R = R or rules()
     # 1) Negaciones
     if _negated_present(t, "manual") or _negated_present(t, "brandbook"):
         _add_reason(reasons, "D descartado: negación explícita")
         return 0.0
     # 2) Lite explícito
-    score_lite = _count_pattern_matches(t, PATTERNS_D_LITE)
+    score_lite = _count_pattern_matches(t, R.patterns["D_LITE"], hits, "D_LITE")
     if score_lite >= 1:
         _add_reason(reasons, f"D lite: {score_lite} señales explícitas")
         return 0.6
     # 3) Full explícito
-    score_full = _count_pattern_matches(t, PATTERNS_D_FULL)
+    score_full = _count_pattern_matches(t, R.patterns["D_FULL"], hits, "D_FULL")
     if score_full >= 1:
         _add_reason(reasons, f"D full: {score_full} señales fuertes")
         return 1.0
     # 4) Genérico → full
-    if any(kw in t for kw in KW_D_GENERIC):
+    if _keyword_hits(t, R.keywords["D_GENERIC"], hits, "D_GENERIC", first=True):
         _add_reason(reasons, "D full: mención genérica sin calificador (regla de negocio)")
         return 1.0
     return 0.0
@@ -372,31 +639,147 @@ def _detect_module_d(text: str, reasons: List[str]) -> float:
 # API PRINCIPAL
 # ============================================================================
 
-def detect_module_weights(brief: str) -> Dict[str, Any]:
-    reasons: List[str] = []
-    weights: Dict[str, float] = {"A":0.0,"B":0.0,"C":0.0,"D":0.0,"E":0.0}
+# Los detectores reciben el texto ya normalizado (ParsedBrief normaliza una sola vez)
+_DETECTORS = (
+    ("A", _detect_module_a),
+    ("B", _detect_module_b),
+    ("C", _detect_module_c),
+    ("D", _detect_module_d),
+    ("E", _detect_impl_weight),
+)
 
-    a = _detect_module_a(brief, reasons)
-    if a > 0: weights["A"] = a
+def detect_module_weights(brief: str) -> Dict[str, Any]:
+    return ParsedBrief(brief).to_dict()
 
-    b = _detect_module_b(brief, reasons)
-    if b > 0: weights["B"] = b
+# ============================================================================
+# PARSE INCREMENTAL (vista previa en vivo)
+# ============================================================================
 
-    c = _detect_module_c(brief, reasons)
-    if c > 0: weights["C"] = c
+# Si ninguna señal de un módulo (ParserRules.signals: todo lo que su detector consulta)
+# toca la zona editada —ni antes ni después de la edición— el conjunto de matches del
+# módulo no cambió y su resultado se reusa.
 
-    d = _detect_module_d(brief, reasons)
-    if d > 0: weights["D"] = d
+# Nivel que sugiere cada grupo de reglas (los que no figuran toman el nivel final del módulo)
+_HIT_LEVELS = {
+    "B_FULL": "full", "B_LITE_HINTS": "lite",
+    "C_FULL": "full", "C_REBRAND": "rebranding", "C_REFRESH": "refresh", "C_AJUSTE": "refresh",
+    "D_FULL": "full", "D_LITE": "lite",
+    "E_PLUS": "plus", "E_FULL": "full", "E_LITE": "lite",
+}
 
-    e = _detect_impl_weight(brief, reasons)
-    if e > 0: weights["E"] = e
+class ParsedBrief:
+    """
+    Resultado de detect_module_weights que guarda el texto normalizado y el resultado
+    por módulo, para re-evaluar solo los módulos afectados cuando el brief cambia.
+    """
 
-    weights = {k:v for k,v in weights.items() if v > 0}
-    return {
-        "modulos_pesos": weights,
-        "razones": reasons,
-        "scores": {k:v for k,v in weights.items()},
-    }
+    # Contexto alrededor de la edición: cubre el match más largo de los patrones
+    # (p. ej. negador + 4 palabras + keyword).
+    MARGIN = 120
+
+    __slots__ = ("source", "text", "modules", "reevaluated", "rules")
+
+    def __init__(self, brief: Any):
+        self.rules = rules()  # un parse usa un solo set de reglas aunque haya un reload en el medio
+        self.source = brief if isinstance(brief, str) else str(brief or "")
+        self.text = _normalize(brief)
+        self.modules: Dict[str, Any] = {m: self._run(fn) for m, fn in _DETECTORS}
+        self.reevaluated = tuple(m for m, _ in _DETECTORS)
+
+    def _run(self, fn: Any) -> Any:
+        reasons: List[str] = []
+        hits: List[Hit] = []
+        return fn(self.text, reasons, self.rules, hits), reasons, hits
+
+    def update(self, brief: Any) -> "ParsedBrief":
+        """Nuevo ParsedBrief para `brief`, reusando los módulos que la edición no toca."""
+        if rules() is not self.rules:  # cambiaron las reglas: nada del parse anterior sirve
+            return ParsedBrief(brief)
+        new = _normalize(brief)
+        old = self.text
+        source = brief if isinstance(brief, str) else str(brief or "")
+        if new == old:
+            if source == self.source:
+                return self
+            out = object.__new__(ParsedBrief)  # mismo texto normalizado, otros offsets
+            out.rules, out.source, out.text = self.rules, source, new
+            out.modules, out.reevaluated = self.modules, ()
+            return out
+        n = min(len(old), len(new))
+        pre = 0
+        while pre < n and old[pre] == new[pre]:
+            pre += 1
+        suf = 0
+        while suf < n - pre and old[-1 - suf] == new[-1 - suf]:
+            suf += 1
+        lo = max(0, pre - self.MARGIN)
+        old_win = old[lo:len(old) - suf + self.MARGIN]
+        new_win = new[lo:len(new) - suf + self.MARGIN]
+
+        out = object.__new__(ParsedBrief)
+        out.rules = self.rules
+        out.source = source
+        out.text = new
+        out.modules = {}
+        redo = []
+        tail, delta = len(old) - suf, len(new) - len(old)
+        for m, fn in _DETECTORS:
+            sig = self.rules.signals[m]
+            if sig.search(old_win) or sig.search(new_win):
+                out.modules[m] = out._run(fn)
+                redo.append(m)
+            else:
+                # los matches del módulo quedan antes o después de la edición: se corren los de después
+                w, rs, hits = self.modules[m]
+                out.modules[m] = (w, rs, [
+                    (g, i, a + delta, b + delta) if a >= tail else (g, i, a, b)
+                    for g, i, a, b in hits if b <= pre or a >= tail
+                ])
+        out.reevaluated = tuple(redo)
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        reasons: List[str] = []
+        weights: Dict[str, float] = {}
+        for m, _ in _DETECTORS:
+            w, rs, _ = self.modules[m]
+            for r in rs:
+                _add_reason(reasons, r)
+            if w > 0:
+                weights[m] = w
+        return {
+            "modulos_pesos": weights,
+            "razones": reasons,
+            "scores": dict(weights),
+        }
+
+    def spans(self) -> List[Dict[str, Any]]:
+        """
+        Fragmentos del brief original que dispararon cada módulo detectado, a partir de
+        los matches que ya anotó el parse (no se vuelve a correr ningún patrón).
+        """
+        text, starts, ends = _normalize_with_offsets(self.source)
+        if text != self.text:  # no debería pasar; sin mapa confiable no se resalta nada
+            return []
+        out = []
+        for m, _ in _DETECTORS:
+            w, _, hits = self.modules[m]
+            if w <= 0:
+                continue
+            for group, i, a, b in hits:
+                if b <= a:
+                    continue
+                start, end = starts[a], ends[b - 1]
+                out.append({
+                    "module": m,
+                    "level": _HIT_LEVELS.get(group) or level_label(w),
+                    "start": start,
+                    "end": end,
+                    "pattern": f"{group}#{i}",
+                    "text": self.source[start:end],
+                })
+        out.sort(key=lambda sp: (sp["start"], -sp["end"]))
+        return out
 
 # ============================================================================
 # DEBUG COMPATIBLE CON TU UI
@@ -404,15 +787,16 @@ def detect_module_weights(brief: str) -> Dict[str, Any]:
 
 def debug_parse(brief_text: str) -> Dict[str, Any]:
     t = _normalize(brief_text)
+    R = rules()
     strong = []
-    for kw in ["naming","logo","logotipo","rebranding","refresh","manual","identidad","pack","piezas","lanzamiento","brandbook"]:
+    for kw in ["naming","logo","logotipo","rebranding","refresh","manual","identidad","pack","pieza","lanzamiento","brandbook"]:
         if _has_keyword(t, kw):
             strong.append(kw)
     parsed = detect_module_weights(brief_text)
-    wants_rebrand = _count_pattern_matches(t, PATTERNS_C_REBRAND) > 0
-    wants_refresh = _count_pattern_matches(t, PATTERNS_C_REFRESH) > 0
-    has_naming    = _count_pattern_matches(t, PATTERNS_C_NAMING)  > 0
-    has_logo      = _count_pattern_matches(t, PATTERNS_C_LOGO)    > 0
+    wants_rebrand = _count_pattern_matches(t, R.patterns["C_REBRAND"]) > 0
+    wants_refresh = _count_pattern_matches(t, R.patterns["C_REFRESH"]) > 0
+    has_naming    = _count_pattern_matches(t, R.patterns["C_NAMING"])  > 0
+    has_logo      = _count_pattern_matches(t, R.patterns["C_LOGO"])    > 0
     return {
         "mode": "auto",
         "has_naming": has_naming,
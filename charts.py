@@ -0,0 +1,73 @@
+# charts.py — render de gráficos de Stats a bytes (PNG/SVG) con caché por hash de datos
+# Usa matplotlib.figure.Figure directo (sin pyplot) para no registrar figuras globales
+# y libera cada figura apenas se serializa.
+
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence
+
+CACHE_MAX = 64
+
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_lock = threading.Lock()
+
+def _key(spec: Dict[str, Any]) -> str:
+    raw = json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _render(spec: Dict[str, Any]) -> bytes:
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+        labels: List[str] = spec["labels"]
+        values: List[float] = spec["values"]
+        if spec["kind"] == "bar":
+            ax.bar(labels, values)
+            ax.tick_params(axis="x", labelrotation=90)
+        else:
+            ax.plot(labels, values, marker="o")
+            for lbl in ax.get_xticklabels():
+                lbl.set_rotation(45)
+                lbl.set_ha("right")
+        ax.set_xlabel(spec["xlabel"]); ax.set_ylabel(spec["ylabel"]); ax.set_title(spec["title"])
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format=spec["fmt"])
+        return buf.getvalue()
+    finally:
+        fig.clear()
+        del fig
+
+def render_chart(kind: str, labels: Sequence[Any], values: Sequence[float],
+                 xlabel: str = "", ylabel: str = "", title: str = "", fmt: str = "png") -> bytes:
+    """
+    Devuelve el gráfico (kind: 'bar' | 'line') serializado en `fmt` ('png' | 'svg').
+    El resultado se comparte entre sesiones mientras los datos no cambien.
+    """
+    spec = {
+        "kind": kind, "fmt": fmt,
+        "labels": [str(x) for x in labels],
+        "values": [float(v) for v in values],
+        "xlabel": xlabel, "ylabel": ylabel, "title": title,
+    }
+    k = _key(spec)
+    with _lock:
+        hit = _cache.get(k)
+        if hit is not None:
+            _cache.move_to_end(k)
+            return hit
+    data = _render(spec)
+    with _lock:
+        _cache[k] = data
+        while len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    return data
+
+def clear_cache() -> None:
+    with _lock:
+        _cache.clear()
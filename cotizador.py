@@ -0,0 +1,185 @@
+# cotizador.py — CLI por lotes (sin Streamlit)
+# Lee briefs + parámetros desde CSV o NDJSON y emite una cotización por fila (NDJSON o CSV).
+#
+#   python cotizador.py briefs.csv -o cotizaciones.ndjson
+#   python cotizador.py briefs.ndjson --pdf-dir pdfs/ --jobs 4
+#   cat briefs.ndjson | python cotizador.py - --format csv
+#   python cotizador.py briefs.csv --tenant mx --pdf-dir pdfs/   (catálogo y estudio de tenants.json)
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+from asset_store import default_store
+from pricing import load_catalog
+from quote_core import SCENARIO_LABELS, quote_brief, render_quote_pdf_bundle, pdf_filename
+from currency import RateMatrix, rate_matrix
+from tenants import StudioProfile, catalog_for, get_tenant
+
+PARAM_DEFAULTS = {
+    "cliente_tipo": "PyME",
+    "urgencia": "Normal",
+    "complejidad": "Media",
+    "idiomas": 1,
+    "stakeholders": "uno",
+    "relacion": "Nuevo",
+}
+CSV_FIELDS = [
+    "row", "id", "cliente_nombre", "modulos", "base_usd", "adjusted_usd",
+    "minimo_usd", "logico_usd", "maximo_usd", "total_coef", "pdf", "error",
+]
+
+# ------------------------
+# Entrada
+# ------------------------
+def read_rows(fh: TextIO, fmt: str) -> Iterator[Union[Dict[str, Any], str]]:
+    """
+    Filas de entrada: dicts en CSV; en NDJSON el texto de cada línea, que se parsea
+    en quote_row (una línea inválida es un error de esa fila, no corta el lote).
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(fh)
+        return
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield line
+
+def _parse_row(row: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido ({e})") from None
+    if not isinstance(row, dict):
+        raise ValueError(f"se esperaba un objeto JSON, no {type(row).__name__}")
+    return row
+
+def _detect_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+# ------------------------
+# Proceso por fila
+# ------------------------
+def quote_row(catalog: Dict[str, Any], i: int, row: Union[Dict[str, Any], str], rate: float,
+              scenario: str, pdf_dir: Optional[str],
+              studio: Optional[StudioProfile] = None,
+              currencies: Optional[List[str]] = None, fx: Optional[RateMatrix] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"row": i, "id": "", "cliente_nombre": ""}
+    try:
+        row = _parse_row(row)
+        out.update(id=row.get("id", ""), cliente_nombre=row.get("cliente_nombre", ""))
+        brief = str(row.get("brief") or "").strip()
+        if not brief:
+            raise ValueError("brief vacío")
+        params = {k: (row.get(k) or v) for k, v in PARAM_DEFAULTS.items()}
+        result = quote_brief(catalog, brief, params)
+        out.update(result)
+        if pdf_dir:
+            scenarios = list(SCENARIO_LABELS) if scenario == "todos" else [scenario]
+            pdf = render_quote_pdf_bundle(result, brief, out["cliente_nombre"], scenarios, rate, studio,
+                                         currencies, fx)
+            name = f"{i:05d}_{pdf_filename(out['cliente_nombre'] or out['id'] or 'cliente')}"
+            path = os.path.join(pdf_dir, name)
+            with open(path, "wb") as fh:
+                fh.write(pdf)
+            out["pdf"] = path
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    return out
+
+def ordered_map(fn: Callable[[Any], Any], items: Iterable[Any], jobs: int) -> Iterator[Any]:
+    """Como executor.map pero con una ventana acotada: no lee toda la entrada de una vez."""
+    if jobs <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending: deque = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= jobs * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# ------------------------
+# Salida
+# ------------------------
+def _csv_record(r: Dict[str, Any]) -> Dict[str, Any]:
+    sc = r.get("scenarios", {})
+    return {
+        "row": r["row"], "id": r.get("id", ""), "cliente_nombre": r.get("cliente_nombre", ""),
+        "modulos": json.dumps(r.get("modulos_pesos", {})),
+        "base_usd": r.get("base_usd", ""), "adjusted_usd": r.get("adjusted_usd", ""),
+        "minimo_usd": sc.get("minimo", ""), "logico_usd": sc.get("logico", ""), "maximo_usd": sc.get("maximo", ""),
+        "total_coef": r.get("coefs", {}).get("total_coef", ""),
+        "pdf": r.get("pdf", ""), "error": r.get("error", ""),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="cotizador", description="Cotización por lotes desde CSV/NDJSON.")
+    ap.add_argument("input", help="Archivo .csv / .ndjson ('-' = stdin)")
+    ap.add_argument("-o", "--output", default="-", help="Archivo de salida ('-' = stdout)")
+    ap.add_argument("--input-format", choices=["csv", "ndjson"], help="Forzar formato de entrada")
+    ap.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="Formato de salida")
+    ap.add_argument("--tenant", help="Tenant de tenants.json (catálogo + datos del estudio en los PDFs)")
+    ap.add_argument("--catalog", help="Catálogo a usar en lugar del del tenant")
+    ap.add_argument("--rate", type=float, help="Tasa COP/USD para los PDFs (default: la del catálogo)")
+    ap.add_argument("--currencies", help="Monedas de los PDFs separadas por coma (ej. COP,MXN; default: COP)")
+    ap.add_argument("--scenario", choices=list(SCENARIO_LABELS) + ["todos"], default="logico",
+                    help="Escenario de los PDFs ('todos' = las tres opciones en un mismo PDF)")
+    ap.add_argument("--pdf-dir", help="Si se indica, genera un PDF por fila en este directorio")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 2, help="PDFs en paralelo")
+    args = ap.parse_args(argv)
+
+    tenant = get_tenant(args.tenant)
+    catalog = load_catalog(args.catalog) if args.catalog else catalog_for(tenant.id)
+    rate = args.rate if args.rate else float(catalog["moneda"]["usd_to_cop"])
+    fx = rate_matrix(catalog, {"COP": rate})
+    currencies = [c.strip().upper() for c in args.currencies.split(",") if c.strip()] if args.currencies else None
+    for code in currencies or []:
+        if code not in fx.index:
+            ap.error(f"moneda sin tasa: {code}")
+    if args.pdf_dir:
+        os.makedirs(args.pdf_dir, exist_ok=True)
+        default_store().sweep()
+    jobs = max(1, args.jobs) if args.pdf_dir else 1  # sin PDFs el cálculo es CPU puro: secuencial
+
+    fin = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    errors = 0
+    try:
+        rows = enumerate(read_rows(fin, _detect_format(args.input, args.input_format)), start=1)
+        results = ordered_map(
+            lambda item: quote_row(catalog, item[0], item[1], rate, args.scenario, args.pdf_dir,
+                                   tenant.studio, currencies, fx),
+            rows, jobs,
+        )
+        writer = csv.DictWriter(fout, fieldnames=CSV_FIELDS) if args.format == "csv" else None
+        if writer:
+            writer.writeheader()
+        for r in results:
+            errors += 1 if r.get("error") else 0
+            if writer:
+                writer.writerow(_csv_record(r))
+            else:
+                fout.write(json.dumps(r, ensure_ascii=False) + "\n")
+            fout.flush()
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    if errors:
+        print(f"{errors} fila(s) con error", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# currency.py — monedas de cotización: matriz de tasas cacheada + conversión vectorizada
+# Las tasas USD→X salen, en orden de prioridad, de la lectura en vivo (fx.FxRateStore),
+# del catálogo (moneda.usd_to_mxn, usd_to_clp, …) o de STUB_RATES (offline / demo).
+# Una RateMatrix es una foto inmutable de esas tasas: tarjetas, PDF y Stats convierten
+# cualquier set de monedas contra la misma foto, sin volver a resolver tasas por monto.
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+BASE = "USD"
+CURRENCIES = ("USD", "COP", "MXN", "CLP", "EUR")
+DECIMALS = {"USD": 2, "COP": 0, "MXN": 2, "CLP": 0, "EUR": 2}
+DEFAULT_DISPLAY = ("COP",)
+
+# Referencia aproximada para cuando no hay red ni tasa en el catálogo; no usar para facturar
+STUB_RATES = {"USD": 1.0, "COP": 4000.0, "MXN": 18.5, "CLP": 950.0, "EUR": 0.92}
+
+SOURCE_LABELS = {"live": "en vivo", "catalog": "catálogo", "stub": "referencia local"}
+
+class RateMatrix:
+    """
+    Tasas cruzadas entre `codes`: matrix[i, j] = unidades de codes[j] por unidad de codes[i].
+    Se arma una vez por foto de tasas (ver rate_matrix) y no se modifica.
+    """
+
+    __slots__ = ("codes", "index", "matrix", "usd_rates", "sources")
+
+    def __init__(self, usd_rates: Mapping[str, float], sources: Optional[Mapping[str, str]] = None):
+        import numpy as np
+        codes = (BASE,) + tuple(c for c in usd_rates if c != BASE)
+        v = np.array([1.0] + [float(usd_rates[c]) for c in codes[1:]], dtype=float)
+        if not np.all(v > 0):
+            raise ValueError(f"tasas inválidas: {dict(zip(codes, v.tolist()))}")
+        self.codes: Tuple[str, ...] = codes
+        self.index: Dict[str, int] = {c: i for i, c in enumerate(codes)}
+        self.matrix = v[None, :] / v[:, None]
+        self.matrix.setflags(write=False)
+        self.usd_rates: Dict[str, float] = dict(zip(codes, v.tolist()))
+        self.sources: Dict[str, str] = dict(sources or {})
+
+    def _idx(self, code: str) -> int:
+        try:
+            return self.index[code.upper()]
+        except KeyError:
+            raise ValueError(f"moneda sin tasa: {code}") from None
+
+    def rate(self, from_code: str, to_code: str) -> float:
+        return float(self.matrix[self._idx(from_code), self._idx(to_code)])
+
+    def convert(self, amounts: Any, from_code: str, to_code: str) -> Any:
+        """Convierte un escalar o un array de montos, redondeando a los decimales de `to_code`."""
+        import numpy as np
+        out = np.asarray(amounts, dtype=float) * self.matrix[self._idx(from_code), self._idx(to_code)]
+        return np.round(out, DECIMALS.get(to_code.upper(), 2))
+
+    def convert_many(self, amounts: Any, from_code: str, to_codes: Sequence[str]) -> Dict[str, Any]:
+        """Los mismos montos en varias monedas con un solo producto (montos × fila de la matriz)."""
+        import numpy as np
+        cols = [self._idx(c) for c in to_codes]
+        table = np.multiply.outer(np.asarray(amounts, dtype=float), self.matrix[self._idx(from_code), cols])
+        return {c.upper(): np.round(table[..., k], DECIMALS.get(c.upper(), 2)) for k, c in enumerate(to_codes)}
+
+    def format_many(self, amount: float, from_code: str, to_codes: Sequence[str]) -> List[str]:
+        """['COP 9,440,000', 'MXN 43,660.00', …] para un monto."""
+        conv = self.convert_many(amount, from_code, to_codes)
+        return [format_amount(float(v), c) for c, v in conv.items()]
+
+def format_amount(amount: float, code: str) -> str:
+    return f"{code} {amount:,.{DECIMALS.get(code, 2)}f}"
+
+def catalog_rates(catalog: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Tasas USD→X declaradas en el catálogo (moneda.usd_to_cop, usd_to_mxn, …)."""
+    moneda = (catalog or {}).get("moneda", {}) or {}
+    out = {}
+    for k, v in moneda.items():
+        if k.startswith("usd_to_") and isinstance(v, (int, float)) and v > 0:
+            out[k[len("usd_to_"):].upper()] = float(v)
+    return out
+
+def display_currencies(catalog: Optional[Dict[str, Any]]) -> Tuple[str, ...]:
+    """Monedas a mostrar por defecto (moneda.mostrar del catálogo, o solo COP)."""
+    codes = ((catalog or {}).get("moneda", {}) or {}).get("mostrar") or DEFAULT_DISPLAY
+    return tuple(str(c).upper() for c in codes if str(c).upper() != BASE)
+
+@lru_cache(maxsize=32)
+def _matrix(rates: Tuple[Tuple[str, float, str], ...]) -> RateMatrix:
+    return RateMatrix({c: r for c, r, _ in rates}, {c: s for c, _, s in rates})
+
+def rate_matrix(catalog: Optional[Dict[str, Any]] = None,
+                live: Optional[Mapping[str, float]] = None,
+                codes: Iterable[str] = CURRENCIES) -> RateMatrix:
+    """
+    Foto de tasas para `codes`: en vivo > catálogo > STUB_RATES. La matriz se cachea
+    por valores de tasa, así que reruns con las mismas tasas reusan la misma instancia.
+    """
+    layers = (("live", {k.upper(): float(v) for k, v in (live or {}).items() if v}),
+              ("catalog", catalog_rates(catalog)),
+              ("stub", STUB_RATES))
+    picked = []
+    for code in codes:
+        code = code.upper()
+        if code == BASE:
+            continue
+        for source, rates in layers:
+            if code in rates:
+                picked.append((code, rates[code], source))
+                break
+    return _matrix(tuple(picked))
+
+def convert(amounts: Any, from_code: str, to_code: str,
+            matrix: Optional[RateMatrix] = None) -> Any:
+    """Conversión vectorizada con la matriz indicada (por defecto, catálogo vacío + stub)."""
+    return (matrix or rate_matrix()).convert(amounts, from_code, to_code)
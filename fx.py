@@ -0,0 +1,261 @@
+# fx.py — tasa USD→COP persistente en disco con refresco en segundo plano
+# Las lecturas nunca bloquean: devuelven la última tasa conocida (con su antigüedad)
+# y, si está vencida, disparan un refresco asíncrono contra los proveedores.
+# Cada lectura trae también USD→LIVE_SYMBOLS (para currency.rate_matrix).
+
+import csv
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import storage
+
+FX_STORE_PATH = "fx_rate.json"
+DEFAULT_MAX_AGE = 3600  # segundos
+FAILURE_BACKOFF_MAX = 3600  # tope de espera entre reintentos cuando fallan todos los proveedores
+HTTP_TIMEOUT = 8
+LIVE_SYMBOLS = ("COP", "MXN", "CLP", "EUR")
+
+# Un proveedor devuelve (tasa COP, etiqueta de fuente[, tasas USD→X]) o None si falla
+Provider = Callable[[], Optional[Tuple[Any, ...]]]
+
+def _pick(rates: Dict[str, Any]) -> Dict[str, float]:
+    return {k: float(rates[k]) for k in LIVE_SYMBOLS if k in rates}
+
+# ------------------------
+# Proveedores HTTP (requests se importa recién al usarlos)
+# ------------------------
+def exchangerate_host() -> Optional[Tuple[Any, ...]]:
+    import requests
+    resp = requests.get(
+        "https://api.exchangerate.host/latest",
+        params={"base": "USD", "symbols": ",".join(LIVE_SYMBOLS)},
+        timeout=HTTP_TIMEOUT,
+    )
+    if not resp.ok:
+        return None
+    data = resp.json()
+    rate = float(data["rates"]["COP"])
+    ts = data.get("date") or datetime.utcnow().strftime("%Y-%m-%d")
+    return rate, f"exchangerate.host · {ts}", _pick(data["rates"])
+
+def open_er_api() -> Optional[Tuple[Any, ...]]:
+    import requests
+    resp = requests.get("https://open.er-api.com/v6/latest/USD", timeout=HTTP_TIMEOUT)
+    if not resp.ok:
+        return None
+    data = resp.json()
+    rate = float(data["rates"]["COP"])
+    ts = data.get("time_last_update_utc") or datetime.utcnow().strftime("%Y-%m-%d")
+    return rate, f"open.er-api.com · {ts}", _pick(data["rates"])
+
+DEFAULT_PROVIDERS: List[Provider] = [exchangerate_host, open_er_api]
+
+# ------------------------
+# Store
+# ------------------------
+@dataclass(frozen=True)
+class FxReading:
+    rate: float
+    source: str
+    fetched_at: float  # epoch (segundos)
+    rates: Dict[str, float] = field(default_factory=dict)  # USD→X del mismo fetch (incluye COP)
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+def format_age(seconds: float) -> str:
+    s = int(seconds)
+    if s < 60:
+        return "hace instantes"
+    if s < 3600:
+        return f"hace {s // 60} min"
+    if s < 86400:
+        return f"hace {s // 3600} h"
+    return f"hace {s // 86400} d"
+
+class FxRateStore:
+    def __init__(self, path: str = FX_STORE_PATH,
+                 providers: Optional[List[Provider]] = None,
+                 max_age: float = DEFAULT_MAX_AGE,
+                 history: Optional["FxHistory"] = None):
+        self.path = path
+        self.providers = list(providers if providers is not None else DEFAULT_PROVIDERS)
+        self.max_age = float(max_age)
+        self.history = history
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._failures = 0  # refrescos fallidos seguidos
+        self._retry_at = 0.0  # epoch antes del cual get() no vuelve a intentar
+        self._reading: Optional[FxReading] = self._load()
+
+    def _load(self) -> Optional[FxReading]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                d = json.load(fh)
+            return FxReading(float(d["rate"]), str(d["source"]), float(d["fetched_at"]),
+                             {k: float(v) for k, v in (d.get("rates") or {}).items()})
+        except Exception:
+            return None
+
+    def _persist(self, reading: FxReading) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"rate": reading.rate, "source": reading.source,
+                       "fetched_at": reading.fetched_at, "rates": reading.rates}, fh)
+        os.replace(tmp, self.path)  # escritura atómica
+
+    def get(self) -> Optional[FxReading]:
+        """
+        Última tasa conocida (puede ser None en el primer arranque). No bloquea.
+        Después de un refresco fallido espera un backoff antes de volver a intentar.
+        """
+        reading = self._reading
+        if (reading is None or reading.age_seconds > self.max_age) and time.time() >= self._retry_at:
+            self.refresh_async()
+        return reading
+
+    def _backoff(self) -> float:
+        # min(max_age, 60 s), duplicándose por cada fallo seguido
+        base = min(self.max_age, 60.0)
+        return min(base * 2 ** min(self._failures - 1, 16), max(base, FAILURE_BACKOFF_MAX))
+
+    def refresh(self) -> Optional[FxReading]:
+        """Consulta los proveedores en orden (bloqueante) y persiste la primera tasa válida."""
+        for provider in self.providers:
+            try:
+                got = provider()
+            except Exception:
+                got = None
+            if not got:
+                continue
+            rates = dict(got[2]) if len(got) > 2 and got[2] else {}
+            rates["COP"] = float(got[0])
+            reading = FxReading(float(got[0]), str(got[1]), time.time(), rates)
+            self._reading = reading
+            self._failures, self._retry_at = 0, 0.0
+            try:
+                self._persist(reading)
+            except OSError:
+                pass
+            if self.history is not None:
+                try:
+                    self.history.record(date.today().isoformat(), reading.rate, reading.source)
+                except Exception:
+                    pass
+            return reading
+        self._failures += 1
+        self._retry_at = time.time() + self._backoff()
+        return None
+
+    def refresh_async(self) -> Optional[threading.Thread]:
+        """Lanza un refresco en un hilo daemon, salvo que ya haya uno en curso."""
+        with self._lock:
+            if self._refreshing:
+                return None
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        t = threading.Thread(target=_run, name="fx-refresh", daemon=True)
+        t.start()
+        return t
+
+# ------------------------
+# Serie histórica (re-valuación de cotizaciones a la tasa de su fecha)
+# ------------------------
+def _date_key(d: Any) -> str:
+    """'YYYY-MM-DD' para búsqueda as-of; un mes 'YYYY-MM' se evalúa a fin de mes."""
+    if isinstance(d, (datetime, date)):
+        return d.isoformat()[:10]
+    k = str(d or "")[:10]
+    return k + "-31" if len(k) == 7 else k
+
+class FxHistory:
+    """
+    Serie de tasas por fecha guardada en storage (tabla fx_history).
+    Se carga una sola vez en arrays ordenados; las consultas son búsquedas binarias
+    vectorizadas (tasa vigente = la última con fecha <= a la consultada).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Optional[Tuple[Any, Any]] = None
+
+    def _arrays(self) -> Tuple[Any, Any]:
+        import numpy as np
+        series = self._series
+        if series is None:
+            rows = storage.load_fx_history()
+            dates = np.array([r[0] for r in rows], dtype="U10")
+            rates = np.array([float(r[1]) for r in rows], dtype=float)
+            series = self._series = (dates, rates)
+        return series
+
+    def invalidate(self) -> None:
+        self._series = None
+
+    def record(self, day: str, rate: float, source: str = "") -> None:
+        with self._lock:
+            storage.upsert_fx_rates([(_date_key(day), float(rate), source)])
+            self.invalidate()
+
+    def import_csv(self, path: str, source: str = "csv") -> int:
+        """Importa filas 'fecha,tasa[,fuente]' (con o sin encabezado)."""
+        rows = []
+        with open(path, "r", encoding="utf-8", newline="") as fh:
+            for rec in csv.reader(fh):
+                if len(rec) < 2:
+                    continue
+                try:
+                    rate = float(rec[1])
+                except ValueError:
+                    continue  # encabezado u otra basura
+                rows.append((_date_key(rec[0].strip()), rate, (rec[2].strip() if len(rec) > 2 else "") or source))
+        with self._lock:
+            n = storage.upsert_fx_rates(rows)
+            self.invalidate()
+        return n
+
+    def rates_on(self, dates: Iterable[Any], fallback_rate: Optional[float] = None) -> Any:
+        import numpy as np
+        known, rates = self._arrays()
+        keys = np.array([_date_key(d) for d in dates], dtype="U10")
+        if not len(known):
+            if fallback_rate is None:
+                raise LookupError("No hay tasas históricas cargadas y no se indicó fallback_rate")
+            return np.full(len(keys), float(fallback_rate))
+        idx = np.searchsorted(known, keys, side="right") - 1
+        return rates[np.clip(idx, 0, len(rates) - 1)]  # antes de la primera fecha: primera tasa
+
+    def rate_on(self, day: Any, fallback_rate: Optional[float] = None) -> float:
+        return float(self.rates_on([day], fallback_rate)[0])
+
+    def to_cop_series(self, usd: Sequence[float], dates: Sequence[Any],
+                      fallback_rate: Optional[float] = None) -> Any:
+        import numpy as np
+        amounts = np.asarray(usd, dtype=float)
+        return np.rint(amounts * self.rates_on(dates, fallback_rate)).astype(np.int64)
+
+_default_history: Optional[FxHistory] = None
+
+def default_history() -> FxHistory:
+    global _default_history
+    if _default_history is None:
+        _default_history = FxHistory()
+    return _default_history
+
+def to_cop_series(usd: Sequence[float], dates: Sequence[Any],
+                  fallback_rate: Optional[float] = None) -> Any:
+    """Convierte montos USD a COP con la tasa histórica de cada fecha (sin red, sin bucles por fila)."""
+    return default_history().to_cop_series(usd, dates, fallback_rate)
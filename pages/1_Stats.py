@@ -1,16 +1,37 @@
-# pages/1_Stats.py — lee de Google Sheets (fallback informativo si no hay datos)
-import os
+# pages/1_Stats.py — lee agregados locales (quote_stats) de Google Sheets + la base local;
+# cada origen se reconstruye desde el suyo
 import pandas as pd
-import matplotlib.pyplot as plt
 import streamlit as st
 import gspread
 from google.oauth2 import service_account
+from storage import STATS_SHEETS, init_db, read_stats, rebuild_stats, rebuild_stats_from_records, stats_rebuilt_at
+from charts import render_chart
+from currency import display_currencies, rate_matrix
+from fx import to_cop_series
+from tenants import catalog_for, pick_tenant, tenant_for_user
 
-st.set_page_config(page_title="Estadísticas — This is Bravo", page_icon="📊", layout="wide")
-st.title("📊 Estadísticas — This is Bravo")
-
-# --- Cargar datos desde Google Sheets ---
+# Tenant de la sesión, como en app.py (el selector "Estudio" deja active_tenant en la sesión)
 try:
+    TENANT, _tenant_error = pick_tenant(tenant_for_user(st.session_state.get("auth_email")),
+                                        st.session_state.get("tenant"),
+                                        st.session_state.get("active_tenant"),
+                                        st.query_params.get("tenant")), None
+except (OSError, ValueError) as e:
+    TENANT, _tenant_error = None, e
+STUDIO_NAME = TENANT.studio.nombre if TENANT else "Cotizador"
+
+st.set_page_config(page_title=f"Estadísticas — {STUDIO_NAME}", page_icon="📊", layout="wide")
+st.title(f"📊 Estadísticas — {STUDIO_NAME}")
+if _tenant_error:
+    st.error(f"tenants.json inválido: {_tenant_error}")
+    st.stop()
+
+@st.cache_resource
+def _init_db():
+    init_db()
+    return True
+
+def _fetch_sheet_records() -> list:
     SHEET_ID = st.secrets["SHEET_ID"]
     WORKSHEET_NAME = st.secrets.get("WORKSHEET_NAME", "Quotes")
     creds_info = dict(st.secrets["gcp_service_account"])
@@ -23,70 +44,102 @@ try:
     )
     gc = gspread.authorize(creds)
     ws = gc.open_by_key(SHEET_ID).worksheet(WORKSHEET_NAME)
-    rows = ws.get_all_records()  # lista de dicts
-    df = pd.DataFrame(rows)
-except Exception as e:
-    st.info(f"No pude leer datos del Google Sheet: {type(e).__name__}. "
-            "Verificá secrets y permisos (compartir con la cuenta de servicio).")
-    st.stop()
+    return ws.get_all_records()  # lista de dicts
 
-if df.empty:
-    st.info("Aún no hay cotizaciones registradas en la hoja. Probá generar alguna desde la página principal.")
-    st.stop()
+def _stats_df(dim: str) -> pd.DataFrame:
+    rows = read_stats(dim)
+    df = pd.DataFrame(rows, columns=["key", "n", "sum_minimo", "sum_logico", "sum_maximo"])
+    df["avg_logico"] = df["sum_logico"] / df["n"].where(df["n"] > 0)
+    return df.set_index("key")
 
-# --- Preprocesamiento liviano ---
-for col in ("minimo_usd", "logico_usd", "maximo_usd"):
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+_init_db()
 
-if "timestamp" in df.columns:
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df["mes"] = df["timestamp"].dt.to_period("M").astype(str)
-elif "Fecha" in df.columns:
-    # Si tu hoja tiene una columna 'Fecha' ISO
-    df["timestamp"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    df["mes"] = df["timestamp"].dt.to_period("M").astype(str)
+# --- Reconstrucción (a pedido, o desde la hoja si nunca se hizo) ---
+# El disparador automático es la marca de reconstrucción, no que los agregados estén vacíos:
+# una hoja vacía no se vuelve a leer en cada render. Si falla, no se reintenta en la sesión.
+rebuild = st.sidebar.button("Reconstruir agregados")
+if rebuild or (stats_rebuilt_at(STATS_SHEETS) is None and not st.session_state.get("sheets_rebuild_failed")):
+    with st.spinner("Reconstruyendo agregados…"):
+        if rebuild:
+            rebuild_stats()
+        try:
+            rebuild_stats_from_records(_fetch_sheet_records())
+            st.session_state.pop("sheets_rebuild_failed", None)
+        except Exception as e:
+            st.session_state["sheets_rebuild_failed"] = True
+            st.info(f"No pude leer datos del Google Sheet: {type(e).__name__}. "
+                    "Verificá secrets y permisos (compartir con la cuenta de servicio).")
+
+total = read_stats("total")
+if not total or not total[0][1]:
+    st.info("Aún no hay cotizaciones registradas. Probá generar alguna desde la página principal.")
+    st.stop()
+
+# Foto de tasas (catálogo > stub) para los montos en otras monedas; COP usa la serie histórica
+catalog = catalog_for(TENANT.id)
+fx_rates = rate_matrix(catalog)
+currency_options = [c for c in fx_rates.codes if c != "USD"]
+codes = st.sidebar.multiselect("Monedas", currency_options,
+                               default=[c for c in display_currencies(catalog) if c in currency_options])
+other_codes = [c for c in codes if c != "COP"]
 
 # --- KPIs ---
-total_cotizaciones = len(df)
-ticket_promedio = df["logico_usd"].mean() if "logico_usd" in df else 0.0
-ticket_min = df["minimo_usd"].mean() if "minimo_usd" in df else 0.0
-ticket_max = df["maximo_usd"].mean() if "maximo_usd" in df else 0.0
+_, total_cotizaciones, sum_min, sum_log, sum_max = total[0]
+ticket_promedio = sum_log / total_cotizaciones
+ticket_min = sum_min / total_cotizaciones
+ticket_max = sum_max / total_cotizaciones
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Cotizaciones registradas", f"{total_cotizaciones}")
 c2.metric("Ticket lógico promedio (USD)", f"{ticket_promedio:,.2f}")
 c3.metric("Mínimo promedio (USD)", f"{ticket_min:,.2f}")
 c4.metric("Máximo promedio (USD)", f"{ticket_max:,.2f}")
+if codes:
+    st.caption("Ticket lógico promedio: " + " · ".join(fx_rates.format_many(ticket_promedio, "USD", codes)))
 
 st.markdown("---")
 
+by_client = _stats_df("cliente_tipo")
+
 # --- Gráfico: distribución por tipo de cliente ---
-if "cliente_tipo" in df.columns:
+if not by_client.empty:
     st.subheader("Distribución por tipo de cliente")
-    counts = df["cliente_tipo"].value_counts().sort_values(ascending=False)
-    fig1, ax1 = plt.subplots()
-    counts.plot(kind="bar", ax=ax1)  # sin colores/estilos explícitos
-    ax1.set_xlabel("Tipo de cliente"); ax1.set_ylabel("Cantidad"); ax1.set_title("Cantidad por cliente")
-    st.pyplot(fig1)
+    counts = by_client["n"].sort_values(ascending=False)
+    st.image(render_chart("bar", counts.index, counts.values,
+                          "Tipo de cliente", "Cantidad", "Cantidad por cliente"))
 
 # --- Gráfico: ticket promedio por tipo de cliente ---
-if {"cliente_tipo","logico_usd"}.issubset(df.columns):
+if not by_client.empty:
     st.subheader("Ticket lógico promedio por tipo de cliente (USD)")
-    avg_client = df.groupby("cliente_tipo")["logico_usd"].mean().sort_values(ascending=False)
-    fig2, ax2 = plt.subplots()
-    avg_client.plot(kind="bar", ax=ax2)
-    ax2.set_xlabel("Tipo de cliente"); ax2.set_ylabel("USD"); ax2.set_title("Promedio por cliente")
-    st.pyplot(fig2)
+    avg_client = by_client["avg_logico"].sort_values(ascending=False)
+    st.image(render_chart("bar", avg_client.index, avg_client.values,
+                          "Tipo de cliente", "USD", "Promedio por cliente"))
 
 # --- Gráfico: evolución mensual ---
-if {"mes","logico_usd"}.issubset(df.columns):
+monthly = _stats_df("mes").drop(index="(s/d)", errors="ignore")
+if not monthly.empty:
     st.subheader("Evolución mensual — Total lógico (USD)")
-    monthly = df.groupby("mes")["logico_usd"].sum().reset_index()
-    fig3, ax3 = plt.subplots()
-    ax3.plot(monthly["mes"], monthly["logico_usd"], marker="o")
-    ax3.set_xlabel("Mes"); ax3.set_ylabel("USD"); ax3.set_title("Suma mensual (no implica ventas)")
-    plt.xticks(rotation=45, ha="right")
-    st.pyplot(fig3)
-
-st.caption("Fuente: Google Sheets (Worksheet: Quotes).")
\ No newline at end of file
+    st.image(render_chart("line", monthly.index, monthly["sum_logico"].values,
+                          "Mes", "USD", "Suma mensual (no implica ventas)"))
+    # Re-valuación a la tasa histórica de cada mes (fallback: tasa del catálogo)
+    catalog_rate = float(catalog.get("moneda", {}).get("usd_to_cop", 4300))
+    monthly["total_logico_cop"] = to_cop_series(monthly["sum_logico"].values, monthly.index, catalog_rate)
+    columns = {"n": "Cotizaciones", "sum_logico": "Total lógico USD",
+               "total_logico_cop": "Total lógico COP (tasa del mes)"}
+    # resto de las monedas: todas las filas en una conversión, con la tasa actual
+    for code, values in fx_rates.convert_many(monthly["sum_logico"].values, "USD", other_codes).items():
+        monthly[f"total_logico_{code.lower()}"] = values
+        columns[f"total_logico_{code.lower()}"] = f"Total lógico {code} (tasa actual)"
+    st.dataframe(monthly[list(columns)].rename(columns=columns))
+
+# --- Tablas: combinación de módulos y escenario elegido ---
+col_mods, col_esc = st.columns(2)
+with col_mods:
+    st.subheader("Por combinación de módulos")
+    st.dataframe(_stats_df("modulos")[["n", "avg_logico"]].sort_values("n", ascending=False))
+with col_esc:
+    st.subheader("Por escenario elegido")
+    st.dataframe(_stats_df("escenario")[["n", "avg_logico"]].sort_values("n", ascending=False))
+
+st.caption("Fuente: agregados locales (quote_stats) de Google Sheets (Worksheet: Quotes) y de la base local; "
+           "cada origen se reconstruye desde el suyo.")
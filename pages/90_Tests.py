@@ -5,6 +5,7 @@ from pricing import (
     load_catalog, base_price_usd, apply_bundles, apply_coefs,
     to_scenarios, to_cop
 )
+from regression import CASES  # compartidos con la corrida headless (python regression.py)
 
 st.set_page_config(page_title="Tests — Bravo Cotizador", layout="wide")
 
@@ -41,21 +42,6 @@ def _catalog():
 
 CAT = _catalog()
 
-CASES = {
-    "A1 Auditoria completa": "Necesitamos una auditoria y benchmark competitivo con analisis de audiencia e insights accionables.",
-    "B1 ADN Full": "Queremos definir el ADN de marca con proposito, arquetipo, territorios y storytelling.",
-    "C1 Naming+Logo": "Necesitamos naming y un nuevo logo con concepto creativo.",
-    "C2 Rebranding full": "Hacer rebranding de la identidad actual sin cambiar el nombre; evolucionar identidad y estilo.",
-    "C3 Refresh": "Hacer un refresh del logo, modernizar colores y ajustar tipografia.",
-    "D1 Brandbook full": "Manual de marca / brandbook completo con grillas, paleta y usos.",
-    "D2 Lite": "Necesitamos paleta de color, tipografia y usos del logo (kit basico).",
-    "E1 Pack lanzamiento": "Pack de 12 piezas para lanzamiento: social media, ppt, banners y brochure.",
-    "E2 Lite": "Necesitamos 3 piezas: un banner, una firma de mail y un post de redes.",
-    "Negaciones": "No cambiar logo ni hacer investigacion; solo naming.",
-    "ONG C+D": "Fundacion: logo y manual basico (2-3 piezas).",
-    "Lanzamiento sin piezas": "Habra lanzamiento pero sin materiales ni campania."
-}
-
 st.title("Suite de tests")
 
 # === Inputs ===
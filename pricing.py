@@ -1,6 +1,8 @@
 import json
 from typing import Dict, Any, Tuple
 
+from brief_parser import level_label
+
 # ------------------------
 # Carga de catálogo
 # ------------------------
@@ -127,16 +129,9 @@ def explain(mod_levels: Dict[str, float], razones: Any, coefs: Dict[str, float])
     parts = []
     ml = mod_levels or {}
     if ml.get("A"): parts.append("A: Research.")
-    if ml.get("B"):
-        parts.append(f"B: Brand DNA ({'lite' if abs(ml['B']-0.65)<1e-9 else 'full'}).")
-    if ml.get("C"):
-        c_txt = "full" if abs(ml["C"]-1.0)<1e-9 else ("rebranding" if abs(ml["C"]-0.8)<1e-9 else "refresh")
-        parts.append(f"C: Creación ({c_txt}).")
-    if ml.get("D"):
-        parts.append(f"D: Brandbook ({'lite' if abs(ml['D']-0.6)<1e-9 else 'full'}).")
-    if ml.get("E"):
-        e_txt = "lite" if abs(ml["E"]-0.6)<1e-9 else ("plus" if abs(ml["E"]-1.5)<1e-9 else "full")
-        parts.append(f"E: Implementación ({e_txt}).")
+    for mod, nombre in (("B", "Brand DNA"), ("C", "Creación"), ("D", "Brandbook"), ("E", "Implementación")):
+        if ml.get(mod):
+            parts.append(f"{mod}: {nombre} ({level_label(ml[mod])}).")
     rs = " ".join(razones or [])
     co = " ".join([f"{k}:{v}" for k,v in (coefs or {}).items()])
     return " • ".join(parts) + (f"\nRazones: {rs}\nCoeficientes: {co}" if rs or co else "")
@@ -0,0 +1,515 @@
+# quote_core.py — flujo brief → pesos → precio → HTML/PDF sin Streamlit
+# Lo usan app.py (UI) y cotizador.py (CLI por lotes). Importarlo es barato:
+# jinja2 y pdfkit se cargan recién cuando se renderiza.
+
+import json
+import logging
+import os
+import re
+import shutil
+import unicodedata
+from dataclasses import replace
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import tracing
+from asset_store import default_store
+from brief_parser import (
+    DELIVERABLES_INDEX, ParsedBrief, deliverables_for, level_label, level_tier,
+    rules as parser_rules,
+)
+from currency import RateMatrix, rate_matrix
+from tenants import DEFAULT_STUDIO, StudioProfile
+
+# ===== pricing (opcional, con fallback de cálculo básico) =====
+try:
+    import pricing as _pricing
+except Exception:
+    _pricing = None
+
+log = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+SCENARIO_LABELS = {"minimo": "Mínimo", "logico": "Lógico", "maximo": "Máximo"}
+
+# ===== Utilidades =====
+def money(x: float) -> str:
+    return f"{x:,.2f}"
+
+def load_catalog_file(path: str) -> Dict[str, Any]:
+    if _pricing and hasattr(_pricing, "load_catalog") and callable(_pricing.load_catalog):
+        try:
+            return _pricing.load_catalog(path)
+        except Exception:
+            pass
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def scen_from(catalog: Dict[str, Any], adjusted_usd: float) -> Dict[str, float]:
+    if _pricing and hasattr(_pricing, "to_scenarios") and callable(_pricing.to_scenarios):
+        try:
+            return _pricing.to_scenarios(catalog, adjusted_usd)
+        except Exception:
+            pass
+    S = catalog.get("escenarios", {})
+    minimo = float(S.get("minimo", 0.85))
+    logico = float(S.get("logico", 1.0))
+    maximo = float(S.get("maximo", 1.3))
+    return {
+        "minimo": round(adjusted_usd * minimo, 2),
+        "logico": round(adjusted_usd * logico, 2),
+        "maximo": round(adjusted_usd * maximo, 2),
+    }
+
+def to_cop_local(rate: float, usd: float) -> int:
+    try:
+        r = float(rate)
+    except Exception:
+        r = 4300.0
+    return int(round(usd * r, 0))
+
+# ===== Entregables =====
+def _build_deliverables_from(mod_weights: Dict[str, float]) -> list[str]:
+    if not isinstance(mod_weights, dict):
+        return []
+    items: list[str] = []
+    seen = set()
+    for mod in ["A", "B", "C", "D", "E"]:
+        try:
+            w = float(mod_weights.get(mod))
+        except Exception:
+            continue
+        if not w or w <= 0:
+            continue
+        for txt in deliverables_for(mod, w):
+            if txt not in seen:
+                items.append(txt)
+                seen.add(txt)
+    return items
+
+# ===== Normalización por keywords =====
+def _normalize_txt(s: str) -> str:
+    s = (s or "").lower()
+    return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+
+def infer_mod_weights_from_brief(brief: str) -> tuple[Dict[str, float], list]:
+    t = _normalize_txt(brief)
+    w: Dict[str, float] = {}
+    reasons: list[str] = []
+
+    # Reglas en parser_rules.json ("infer"): por módulo, la primera regla con alguna keyword gana
+    for mod, reglas in parser_rules().infer:
+        for weight, keywords, reason in reglas:
+            if any(k in t for k in keywords):
+                w[mod] = weight
+                reasons.append(reason)
+                break
+
+    return w, reasons
+
+def merge_weights(parser_weights: Dict[str, float], inferred: Dict[str, float]) -> Dict[str, float]:
+    pw = dict(parser_weights or {})
+    if not inferred:
+        return pw
+    parser_all_full = False
+    if pw:
+        vals = [float(v) for v in pw.values() if v is not None]
+        parser_all_full = len(vals) > 0 and all(abs(v - 1.0) < 1e-6 for v in vals)
+    for m, v in inferred.items():
+        if m not in pw or not pw[m] or float(pw[m]) == 0.0:
+            pw[m] = v; continue
+        if abs(v - 1.0) > 1e-6:
+            pw[m] = v
+        else:
+            if parser_all_full:
+                pw[m] = v
+    return pw
+
+# === PDF / wkhtmltopdf helpers ===
+def _pdfkit_config():
+    import pdfkit
+    env_path = os.environ.get("WKHTMLTOPDF_PATH")
+    if env_path and os.path.exists(env_path):
+        return pdfkit.configuration(wkhtmltopdf=env_path)
+    which_path = shutil.which("wkhtmltopdf")
+    if which_path:
+        return pdfkit.configuration(wkhtmltopdf=which_path)
+    for p in ["/usr/bin/wkhtmltopdf", "/usr/local/bin/wkhtmltopdf"]:
+        if os.path.exists(p):
+            return pdfkit.configuration(wkhtmltopdf=p)
+    raise OSError(
+        "wkhtmltopdf no está instalado en el entorno. "
+        "En Streamlit Cloud, agregá un archivo 'packages.txt' con la línea 'wkhtmltopdf' "
+        "y redeploy. Localmente, instalalo según tu sistema."
+    )
+
+def _safe_filename(s: str) -> str:
+    s = (s or "").strip()
+    s = re.sub(r"\s+", "_", s)
+    s = re.sub(r"[^A-Za-z0-9._-]", "", s)
+    return s or "cotizacion"
+
+# ===== Pricing =====
+def safe_compute_quote(catalog: Dict[str, Any], features: Dict[str, Any],
+                       warn: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    if _pricing and hasattr(_pricing, "compute_quote") and callable(_pricing.compute_quote):
+        try:
+            return _pricing.compute_quote(catalog, features)
+        except Exception as e:
+            (warn or log.warning)(f"compute_quote falló, se usa cálculo básico: {e}")
+
+    mods_cfg = catalog.get("modulos", {})
+    weights: Dict[str, float] = features.get("modulos_pesos", {})
+    base = 0.0
+    for m, w in weights.items():
+        cfg = mods_cfg.get(m, {})
+        price = float(cfg.get("precio_base_usd", 0.0))
+        if m == "E" and float(w) >= 1.0:
+            price = min(price, 600.0)
+        base += price * float(w)
+    base = round(base, 2)
+
+    def _normalize(s: str) -> str:
+        s = str(s).strip().lower()
+        return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+    def keymatch(d: dict, key: str, default=1.0):
+        if not isinstance(d, dict): return default
+        key_n = _normalize(key)
+        for k, v in d.items():
+            if _normalize(k) == key_n: return v
+        return d.get(key, default)
+
+    C = catalog.get("coeficientes", {})
+    c_cliente = float(keymatch(C.get("cliente", {}), features.get("cliente_tipo", "PyME"), 1.0))
+    c_urg     = float(keymatch(C.get("urgencia", {}), features.get("urgencia", "Normal"), 1.0))
+    c_comp    = float(keymatch(C.get("complejidad", {}), features.get("complejidad", "Media"), 1.0))
+    c_rel     = float(keymatch(C.get("relacion", {}),   features.get("relacion", "Nuevo"), 1.0))
+
+    idiomas_total = int(features.get("idiomas", 1))
+    c_id_base  = float(C.get("idiomas", {}).get("base", 1.0))
+    c_id_extra = float(C.get("idiomas", {}).get("extra", 0.0))
+    c_id = c_id_base + max(0, idiomas_total - 1) * c_id_extra
+
+    stks = features.get("stakeholders", "uno")
+    st_map = C.get("stakeholders", {})
+    if isinstance(stks, int):
+        if stks <= 1: c_st = 1.0
+        elif stks == 2: c_st = float(keymatch(st_map, "dos", 1.04))
+        else: c_st = float(keymatch(st_map, "tres_o_mas", 1.08))
+    else:
+        c_st = float(keymatch(st_map, stks, 1.0))
+
+    total_coef = c_cliente * c_urg * c_comp * c_id * c_st * c_rel
+    total_coef = min(total_coef, float(C.get("tope_total_coef", 1.4)))
+
+    adjusted = round(base * total_coef, 2)
+
+    rate = None
+    if "moneda" in catalog and isinstance(catalog["moneda"], dict):
+        rate = catalog["moneda"].get("usd_to_cop")
+    if rate is None:
+        rate = catalog.get("cop_per_usd", catalog.get("tasa_cop", 4300))
+    try:
+        rate = float(rate)
+    except Exception:
+        rate = 4300.0
+
+    return {
+        "base_usd": base,
+        "adjusted_usd": adjusted,
+        "coefs": {
+            "cliente": c_cliente,
+            "urgencia": c_urg,
+            "complejidad": c_comp,
+            "idiomas": round(c_id, 3),
+            "stakeholders": round(c_st, 3),
+            "relacion": c_rel,
+            "total_coef": round(total_coef, 3),
+        },
+        "scenarios": scen_from(catalog, adjusted),
+        "rate": rate,
+    }
+
+# ===== Render HTML =====
+@lru_cache(maxsize=1)
+def _jinja_env():
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=select_autoescape(["html", "xml"]),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+
+def quote_page_context(
+    *,
+    cliente_nombre: str,
+    brief: str,
+    scenario_name: str,
+    amount_usd: float,
+    rate_cop: float,
+    mod_weights: Dict[str, float],
+    coefs: Dict[str, float],
+    validity_days: int = DEFAULT_STUDIO.validity_days,
+    estudio_nombre: str = DEFAULT_STUDIO.nombre,
+    estudio_web: str = DEFAULT_STUDIO.web,
+    estudio_mail: str = DEFAULT_STUDIO.mail,
+    studio_logo_url: str = DEFAULT_STUDIO.logo_url,
+    primary_hex: str = DEFAULT_STUDIO.primary_hex,
+    secondary_hex: str = DEFAULT_STUDIO.secondary_hex,
+    deliverables: Optional[list] = None,
+    payment_terms: str = DEFAULT_STUDIO.payment_terms,
+    validity_text: str = DEFAULT_STUDIO.validity_text,
+    local_amounts: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    _meses_titulo = [
+        "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+        "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
+    ]
+    hoy = datetime.now()
+    fecha_emision = f"{hoy.day:02d} de {_meses_titulo[hoy.month-1]} de {hoy.year}"
+
+    try:
+        amount_cop = int(round(float(amount_usd) * float(rate_cop), 0))
+    except Exception:
+        amount_cop = 0
+
+    intro_text = (
+        "A continuación presentamos el detalle del proyecto: "
+        "las etapas, tareas y entregables que darán forma al trabajo, "
+        "junto con los honorarios correspondientes."
+    )
+
+    etiquetas = {"A": "Research", "B": "Brand DNA", "C": "Creación", "D": "Brandbook", "E": "Implementación"}
+    breakdown = []
+    for k, w in (mod_weights or {}).items():
+        try:
+            w = float(w)
+        except Exception:
+            continue
+        if w <= 0:
+            continue
+        breakdown.append({"modulo": k, "nombre": etiquetas.get(k, k), "nivel": level_label(w)})
+
+    # Entregables por acción: lookup en el índice precalculado de brief_parser
+    acciones_expand = []
+    for b in breakdown:
+        entregables = DELIVERABLES_INDEX.get((b["modulo"], level_tier(b["nivel"])), ())
+        if entregables:
+            acciones_expand.append({"accion": b["nombre"], "entregables": list(entregables)})
+
+    return {
+        "studio_name": estudio_nombre,
+        "studio_site": estudio_web,
+        "studio_email": estudio_mail,
+        "studio_logo_url": studio_logo_url,
+        "primary_hex": primary_hex,
+        "secondary_hex": secondary_hex,
+        "fecha_emision": fecha_emision,
+        "client_name": cliente_nombre or "",
+        "intro_text": intro_text,
+        "scenario_name": scenario_name,
+        "scenario_amount_usd": f"{amount_usd:,.2f}",
+        "scenario_amount_cop": f"{amount_cop:,}",
+        # montos en otras monedas ya formateados ("COP 9,440,000", "MXN 43,660.00"); por defecto, COP
+        "scenario_amounts_local": local_amounts if local_amounts is not None else [f"COP {amount_cop:,}"],
+        "breakdown": breakdown,
+        "deliverables": deliverables or [],
+        "payment_terms": payment_terms,
+        "validity_text": validity_text,
+        "coefs": coefs or {},
+        "acciones_expand": acciones_expand,
+    }
+
+def render_quote_bundle_html(contexts: List[Dict[str, Any]]) -> str:
+    """
+    Un documento HTML con una sección (página nueva) por contexto de render_quote_html.
+    El <head> (estilos, marca) sale del primer contexto.
+    """
+    if not contexts:
+        raise ValueError("se necesita al menos un contexto")
+    pages = [quote_page_context(**ctx) for ctx in contexts]
+    tpl = _jinja_env().get_template("quote.html")
+    return tpl.render(pages=pages, **pages[0])
+
+def render_quote_html(**ctx: Any) -> str:
+    return render_quote_bundle_html([ctx])
+
+def render_quote_footer_html(
+    *,
+    estudio_nombre: str = DEFAULT_STUDIO.nombre,
+    estudio_web: str = DEFAULT_STUDIO.web,
+    estudio_mail: str = DEFAULT_STUDIO.mail,
+    estudio_eslogan: str = DEFAULT_STUDIO.eslogan,
+    studio_logo_url: str = DEFAULT_STUDIO.footer_logo_url,
+    **kwargs
+) -> str:
+    tpl = _jinja_env().get_template("quote_footer.html")
+    context = {
+        "studio_name": estudio_nombre,
+        "studio_site": estudio_web,
+        "studio_email": estudio_mail,
+        "studio_logo_url": studio_logo_url,
+        "studio_slogan": estudio_eslogan,
+    }
+    return tpl.render(**context)
+
+# ===== Pipeline completo =====
+def quote_brief(catalog: Dict[str, Any], brief: str, params: Dict[str, Any],
+                warn: Optional[Callable[[str], Any]] = None,
+                parsed_brief: Optional[ParsedBrief] = None,
+                with_spans: bool = False) -> Dict[str, Any]:
+    """
+    Parser + keywords + pricing para un brief. `params` usa las claves de features
+    (cliente_tipo, urgencia, complejidad, idiomas, stakeholders, relacion).
+    Con `parsed_brief` (ya actualizado al texto de `brief`) se salta el parser.
+    Devuelve la salida de compute_quote más modulos_pesos y razones (y, con
+    `with_spans`, los fragmentos del brief que dispararon cada módulo).
+    """
+    pb = parsed_brief
+    if pb is None:
+        with tracing.span("detect_module_weights"):
+            pb = ParsedBrief(brief)
+    parsed = pb.to_dict()
+    with tracing.span("infer_mod_weights_from_brief"):
+        inferred, reasons_kw = infer_mod_weights_from_brief(brief)
+        mod_weights = merge_weights(parsed.get("modulos_pesos", {}) or {}, inferred)
+
+    features = {
+        "modulos_pesos": mod_weights,
+        "cliente_tipo": params.get("cliente_tipo", "PyME"),
+        "urgencia": params.get("urgencia", "Normal"),
+        "complejidad": params.get("complejidad", "Media"),
+        "idiomas": int(params.get("idiomas", 1) or 1),
+        "stakeholders": params.get("stakeholders", "uno"),
+        "relacion": params.get("relacion", "Nuevo"),
+    }
+    with tracing.span("safe_compute_quote"):
+        result = safe_compute_quote(catalog, features, warn)
+    result["modulos_pesos"] = mod_weights
+    result["razones"] = (parsed.get("razones", []) or []) + reasons_kw
+    if with_spans:
+        result["spans"] = pb.spans()
+    return result
+
+def build_quote_context(q: Dict[str, Any], scenario_name: str, amount_usd: float, rate_cop: float,
+                        studio: Optional[StudioProfile] = None,
+                        currencies: Optional[Sequence[str]] = None,
+                        fx: Optional[RateMatrix] = None) -> dict:
+    """
+    Contexto para render_quote_html a partir de una cotización (dict tipo last_quote).
+    `studio` es el perfil del tenant (por defecto, el de This is Bravo). Con `currencies`
+    el monto se muestra en esas monedas según la foto de tasas `fx` (por defecto, la
+    tasa COP indicada + catálogo/stub para el resto).
+    """
+    mod_weights = q.get("mod_weights", q.get("modulos_pesos", {}))
+    extra = {}
+    if currencies is not None:
+        fx = fx or rate_matrix(live={"COP": rate_cop})
+        extra["local_amounts"] = fx.format_many(float(amount_usd), "USD", list(currencies))
+    return dict(
+        cliente_nombre=q.get("cliente_nombre", ""),
+        brief=q.get("brief", ""),
+        scenario_name=scenario_name,
+        amount_usd=float(amount_usd),
+        rate_cop=float(rate_cop or 0),
+        mod_weights=mod_weights,
+        coefs=q.get("coefs", {}),
+        deliverables=_build_deliverables_from(mod_weights),
+        **(studio or DEFAULT_STUDIO).context(),
+        **extra,
+    )
+
+# ===== Footer: se renderiza y escribe una vez por (template, perfil del estudio) =====
+@lru_cache(maxsize=32)
+def _footer_file(studio: StudioProfile, tpl_mtime_ns: int, tpl_size: int) -> str:
+    with tracing.span("render_quote_footer_html"):
+        html = render_quote_footer_html(**studio.footer_context())
+    return str(default_store().put("footer", html).resolve())
+
+def footer_file(studio: Optional[StudioProfile] = None) -> str:
+    """Ruta absoluta del footer HTML del estudio en el directorio administrado (asset_store)."""
+    studio = studio or DEFAULT_STUDIO
+    st = (TEMPLATES_DIR / "quote_footer.html").stat()  # editar el template invalida la caché
+    path = _footer_file(studio, st.st_mtime_ns, st.st_size)
+    if not os.path.exists(path):  # lo barrió un sweep (o alguien limpió el directorio)
+        _footer_file.cache_clear()
+        path = _footer_file(studio, st.st_mtime_ns, st.st_size)
+    return path
+
+def _studio_from_ctx(ctx: dict) -> StudioProfile:
+    """Perfil para contextos armados a mano (sin `studio`): toma los estudio_* del contexto."""
+    return replace(
+        DEFAULT_STUDIO,
+        nombre=ctx.get("estudio_nombre", DEFAULT_STUDIO.nombre),
+        web=ctx.get("estudio_web", DEFAULT_STUDIO.web),
+        mail=ctx.get("estudio_mail", DEFAULT_STUDIO.mail),
+    )
+
+def render_pdf(ctx: dict, studio: Optional[StudioProfile] = None) -> bytes:
+    """HTML del contexto + footer → PDF (wkhtmltopdf)."""
+    return render_pdf_bundle([ctx], studio)
+
+def render_pdf_bundle(ctxs: List[dict], studio: Optional[StudioProfile] = None) -> bytes:
+    """
+    Varias cotizaciones (una por página nueva) en un solo PDF: un documento HTML,
+    un footer compartido (el de `studio` o, si no viene, el del primer contexto) y una
+    sola llamada a wkhtmltopdf.
+    """
+    ctx = ctxs[0] if ctxs else {}
+    with tracing.span("render_quote_html"):
+        body_html = render_quote_bundle_html(ctxs)
+
+    footer_path = footer_file(studio or _studio_from_ctx(ctx))
+    footer_url = "file://" + footer_path
+
+    options = {
+        "encoding": "UTF-8",
+        "page-size": "A4",
+        "margin-top": "20mm",
+        "margin-right": "16mm",
+        "margin-bottom": "35mm",
+        "margin-left": "16mm",
+        "footer-html": footer_url,
+        "footer-spacing": "5",
+        "enable-local-file-access": "",
+        "load-error-handling": "ignore",
+        "custom-header": [("User-Agent","Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0 Safari/537.36")],
+    }
+    options["allow"] = str(Path(footer_path).parent)
+
+    import pdfkit
+    with tracing.span("wkhtmltopdf"):
+        return pdfkit.from_string(
+            body_html,
+            False,
+            configuration=_pdfkit_config(),
+            options=options
+        )
+
+def render_quote_pdf(result: Dict[str, Any], brief: str, cliente_nombre: str,
+                     scenario: str, rate_cop: float,
+                     studio: Optional[StudioProfile] = None) -> bytes:
+    """PDF de una salida de quote_brief para el escenario indicado ('minimo' | 'logico' | 'maximo')."""
+    return render_quote_pdf_bundle(result, brief, cliente_nombre, [scenario], rate_cop, studio)
+
+def render_quote_pdf_bundle(result: Dict[str, Any], brief: str, cliente_nombre: str,
+                            scenarios: List[str], rate_cop: float,
+                            studio: Optional[StudioProfile] = None,
+                            currencies: Optional[Sequence[str]] = None,
+                            fx: Optional[RateMatrix] = None) -> bytes:
+    """Un PDF con una sección por escenario (p. ej. las tres opciones de una propuesta)."""
+    q = {"cliente_nombre": cliente_nombre, "brief": brief,
+         "mod_weights": result.get("modulos_pesos", {}), "coefs": result.get("coefs", {})}
+    return render_pdf_bundle([
+        build_quote_context(q, SCENARIO_LABELS[sc], result["scenarios"][sc], rate_cop, studio,
+                            currencies, fx)
+        for sc in scenarios
+    ], studio)
+
+def pdf_filename(cliente_nombre: str) -> str:
+    fecha = datetime.now().strftime("%Y%m%d")
+    return f"{fecha}_Cotizacion {_safe_filename(cliente_nombre or 'cliente')}.pdf"
@@ -0,0 +1,197 @@
+# regression.py — corrida headless de scenarios.json + CASES contra parser y pricing
+# Pensado para validar cambios de catálogo / keywords antes de publicarlos.
+#
+#   python regression.py                  # reporte de texto, exit 1 si algo falla
+#   python regression.py --json --jobs 8
+#   python regression.py --repeat 50      # throughput (cotizaciones/s)
+#
+# Un escenario pasa si el precio lógico cae dentro de expected_usd [min, max] y, si el
+# escenario trae "expected_modules", si los módulos detectados coinciden. Los CASES no
+# tienen rangos esperados: se chequea que coticen sin error y que mínimo ≤ lógico ≤ máximo.
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import tracing
+from quote_core import load_catalog_file, quote_brief
+
+# Briefs de referencia (los mismos que usa la página de Tests)
+CASES = {
+    "A1 Auditoria completa": "Necesitamos una auditoria y benchmark competitivo con analisis de audiencia e insights accionables.",
+    "B1 ADN Full": "Queremos definir el ADN de marca con proposito, arquetipo, territorios y storytelling.",
+    "C1 Naming+Logo": "Necesitamos naming y un nuevo logo con concepto creativo.",
+    "C2 Rebranding full": "Hacer rebranding de la identidad actual sin cambiar el nombre; evolucionar identidad y estilo.",
+    "C3 Refresh": "Hacer un refresh del logo, modernizar colores y ajustar tipografia.",
+    "D1 Brandbook full": "Manual de marca / brandbook completo con grillas, paleta y usos.",
+    "D2 Lite": "Necesitamos paleta de color, tipografia y usos del logo (kit basico).",
+    "E1 Pack lanzamiento": "Pack de 12 piezas para lanzamiento: social media, ppt, banners y brochure.",
+    "E2 Lite": "Necesitamos 3 piezas: un banner, una firma de mail y un post de redes.",
+    "Negaciones": "No cambiar logo ni hacer investigacion; solo naming.",
+    "ONG C+D": "Fundacion: logo y manual basico (2-3 piezas).",
+    "Lanzamiento sin piezas": "Habra lanzamiento pero sin materiales ni campania.",
+    "A2 Benchmark de marcas": "Benchmark de hasta cinco marcas del sector",
+    "A3 Insights del consumidor": "Queremos insights del consumidor para la nueva linea.",
+}
+
+# Módulos esperados para los casos que cubren falsos positivos conocidos del parser
+# ("hasta cinco marcas" no son piezas; "insights" no es "insight del consumidor" de B)
+CASE_EXPECTED_MODULES = {
+    "A2 Benchmark de marcas": ["A"],
+    "A3 Insights del consumidor": ["A"],
+}
+
+# scenarios.json usa etiquetas en minúscula / números; el catálogo, las de la UI
+CLIENTE_ALIASES = {
+    "corporativo": "Corporativo",
+    "regional": "Regional",
+    "pyme": "PyME",
+    "emprendimiento": "Emprendimiento/Startup",
+    "startup": "Emprendimiento/Startup",
+    "ong": "Fundacion",
+    "fundacion": "Fundacion",
+}
+STAKEHOLDERS_ALIASES = {1: "uno", 2: "dos"}
+
+def params_from_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Traduce los `inputs` de scenarios.json a los params de quote_brief."""
+    cliente = str(inputs.get("cliente", "pyme"))
+    stk = inputs.get("stakeholders", 1)
+    if isinstance(stk, (int, float)) or str(stk).isdigit():
+        stk = STAKEHOLDERS_ALIASES.get(int(stk), "tres_o_mas")
+    return {
+        "cliente_tipo": CLIENTE_ALIASES.get(cliente.lower(), cliente),
+        "urgencia": str(inputs.get("urgencia", "normal")).capitalize(),
+        "complejidad": str(inputs.get("complejidad", "media")).capitalize(),
+        "idiomas": int(inputs.get("idiomas", 1) or 1),
+        "stakeholders": stk,
+        "relacion": str(inputs.get("relacion", "nuevo")).capitalize(),
+    }
+
+def load_suite(scenarios_path: Optional[str] = "scenarios.json",
+               include_cases: bool = True) -> List[Dict[str, Any]]:
+    suite: List[Dict[str, Any]] = []
+    if scenarios_path:
+        with open(scenarios_path, "r", encoding="utf-8") as fh:
+            for s in json.load(fh):
+                suite.append({
+                    "kind": "scenario",
+                    "name": s["name"],
+                    "brief": s["brief"],
+                    "params": params_from_inputs(s.get("inputs", {})),
+                    "expected_usd": s.get("expected_usd"),
+                    "expected_modules": s.get("expected_modules"),
+                })
+    if include_cases:
+        for name, brief in CASES.items():
+            suite.append({"kind": "case", "name": name, "brief": brief,
+                          "params": params_from_inputs({}),
+                          "expected_modules": CASE_EXPECTED_MODULES.get(name)})
+    return suite
+
+# ------------------------
+# Evaluación
+# ------------------------
+def check(case: Dict[str, Any], result: Dict[str, Any]) -> List[str]:
+    """Lista de fallas (vacía = pasa)."""
+    fails: List[str] = []
+    sc = result.get("scenarios", {})
+    lo, mid, hi = float(sc.get("minimo", 0)), float(sc.get("logico", 0)), float(sc.get("maximo", 0))
+    if not (lo <= mid <= hi):
+        fails.append(f"escenarios desordenados: {lo} / {mid} / {hi}")
+    exp = case.get("expected_usd")
+    if exp and not (float(exp["min"]) <= mid <= float(exp["max"])):
+        fails.append(f"lógico USD {mid:,.2f} fuera de [{exp['min']}, {exp['max']}]")
+    mods = case.get("expected_modules")
+    if mods is not None and sorted(mods) != sorted(result.get("modulos_pesos", {})):
+        fails.append(f"módulos {sorted(result.get('modulos_pesos', {}))} ≠ esperados {sorted(mods)}")
+    return fails
+
+def run_case(catalog: Dict[str, Any], case: Dict[str, Any]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    out = {"kind": case["kind"], "name": case["name"]}
+    try:
+        result = quote_brief(catalog, case["brief"], case["params"])
+        out["modulos_pesos"] = result.get("modulos_pesos", {})
+        out["logico_usd"] = result.get("scenarios", {}).get("logico")
+        out["fails"] = check(case, result)
+    except Exception as e:
+        out["fails"] = [f"{type(e).__name__}: {e}"]
+    out["ok"] = not out["fails"]
+    out["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return out
+
+def run_suite(catalog: Dict[str, Any], suite: List[Dict[str, Any]],
+              jobs: int = 4, repeat: int = 1) -> Dict[str, Any]:
+    """Corre la suite (en paralelo con `jobs` hilos) y junta resultados + tiempos por etapa."""
+    was_enabled = tracing.is_enabled()
+    tracing.enable(True)
+    tracing.reset()
+    t0 = time.perf_counter()
+    try:
+        items = suite * max(1, repeat)
+        if jobs > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(lambda c: run_case(catalog, c), items))
+        else:
+            results = [run_case(catalog, c) for c in items]
+        wall = time.perf_counter() - t0
+        stages = tracing.summary()
+    finally:
+        tracing.enable(was_enabled)
+    results = results[:len(suite)]  # las repeticiones solo cuentan para el throughput
+    return {
+        "ok": all(r["ok"] for r in results),
+        "passed": sum(1 for r in results if r["ok"]),
+        "total": len(results),
+        "wall_ms": round(wall * 1000, 3),
+        "quotes_per_s": round(len(items) / wall, 1) if wall > 0 else None,
+        "stages": stages,
+        "results": results,
+    }
+
+# ------------------------
+# Reporte
+# ------------------------
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    for r in report["results"]:
+        mods = "+".join(r.get("modulos_pesos", {})) or "-"
+        usd = r.get("logico_usd")
+        usd_txt = f"{usd:>10,.2f}" if isinstance(usd, (int, float)) else f"{'-':>10}"
+        lines.append(f"{'PASS' if r['ok'] else 'FAIL'}  {r['kind']:<8} {r['name'][:42]:<42} {usd_txt}  {mods:<10} {r['ms']:>7.2f} ms")
+        for f in r["fails"]:
+            lines.append(f"        └ {f}")
+    lines.append("")
+    lines.append("Etapa                                      n     avg ms    max ms")
+    for stage, s in report["stages"].items():
+        lines.append(f"{stage[:40]:<40} {s['count']:>5} {s['avg_ms']:>10.3f} {s['max_ms']:>9.3f}")
+    lines.append("")
+    lines.append(f"{report['passed']}/{report['total']} OK · {report['wall_ms']:.1f} ms · "
+                 f"{report['quotes_per_s']} cotizaciones/s")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Regresión de escenarios y casos del cotizador.")
+    ap.add_argument("--catalog", default="catalog.json")
+    ap.add_argument("--scenarios", default="scenarios.json")
+    ap.add_argument("--no-cases", action="store_true", help="Solo scenarios.json")
+    ap.add_argument("--jobs", type=int, default=4)
+    ap.add_argument("--repeat", type=int, default=1, help="Repetir la suite N veces (throughput)")
+    ap.add_argument("--json", action="store_true", help="Salida JSON")
+    args = ap.parse_args(argv)
+
+    catalog = load_catalog_file(args.catalog)
+    suite = load_suite(args.scenarios, include_cases=not args.no_cases)
+    report = run_suite(catalog, suite, jobs=args.jobs, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(format_report(report))
+    return 0 if report["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
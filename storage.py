@@ -1,13 +1,50 @@
+import hashlib
 import sqlite3
 import json
-from typing import Dict, Any, List, Tuple
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple, Iterable, Optional
 from datetime import datetime
 
 DB_PATH = "quotes.db"
 
+# Dimensiones de la tabla de agregados (vistas materializadas para KPIs/gráficos)
+STATS_DIMS = ("total", "mes", "cliente_tipo", "modulos", "escenario")
+# Origen de cada agregado: `quotes` local (app_ui) o la hoja de Google Sheets (app.py).
+# Cada uno se reconstruye solo desde su propio origen.
+STATS_LOCAL, STATS_SHEETS = "local", "sheets"
+
+# Revisiones: cada N se guarda además un checkpoint (delta acumulado contra la raíz), así
+# reconstruir cualquier revisión aplica a lo sumo N deltas
+SNAPSHOT_EVERY = 32
+
+_local = threading.local()
+
 def _connect():
+    # hilos con conexión propia (workers de storage_async) la reusan, sea cual sea su base;
+    # el resto abre una por llamada contra DB_PATH
+    con = getattr(_local, "con", None)
+    if con is not None:
+        return con
     return sqlite3.connect(DB_PATH)
 
+def _db_path() -> str:
+    """Base que usa el hilo actual (la de su conexión propia, o DB_PATH)."""
+    return getattr(_local, "path", None) or DB_PATH
+
+def bind_thread_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Abre una conexión persistente para el hilo actual (WAL + busy_timeout, para que
+    varios hilos lean mientras otro escribe). Pensado como initializer de un executor.
+    """
+    path = db_path or DB_PATH
+    con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    _local.con, _local.path = con, path
+    return con
+
 def init_db():
     with _connect() as con:
         cur = con.cursor()
@@ -25,36 +62,539 @@ def init_db():
             coefs TEXT
         )
         """)
+        # agregados de versiones anteriores (sin `source`): se descartan y se reconstruyen
+        if "source" not in {row[1] for row in cur.execute("PRAGMA table_info(quote_stats)")}:
+            cur.execute("DROP TABLE IF EXISTS quote_stats")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS quote_stats (
+            source TEXT NOT NULL,
+            dim TEXT,
+            key TEXT,
+            n INTEGER,
+            sum_minimo REAL,
+            sum_logico REAL,
+            sum_maximo REAL,
+            PRIMARY KEY (source, dim, key)
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS stats_rebuilds (
+            source TEXT PRIMARY KEY,
+            ts TEXT,
+            n INTEGER
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS fx_history (
+            date TEXT PRIMARY KEY,
+            rate REAL,
+            source TEXT
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS quote_revisions (
+            quote_id INTEGER NOT NULL,
+            rev INTEGER NOT NULL,
+            ts TEXT,
+            delta TEXT NOT NULL,
+            snapshot TEXT,
+            PRIMARY KEY (quote_id, rev)
+        ) WITHOUT ROWID
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS briefs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER,
+            z BLOB
+        )
+        """)
+        _add_column(cur, "quotes", "head_rev", "INTEGER NOT NULL DEFAULT 0")
+        _add_column(cur, "quotes", "brief_hash", "TEXT")
+        _migrate_briefs(cur)
+        if _rebuilt_at(cur, STATS_LOCAL) is None:
+            _rebuild_local_stats(cur)
+        con.commit()
+
+def _add_column(cur: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    """Migración idempotente: agrega la columna si la base es de una versión anterior."""
+    cols = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# ------------------------
+# Agregados (actualización incremental + reconstrucción)
+# ------------------------
+def modulos_key(mod_levels: Any) -> str:
+    """Clave de la dimensión `modulos` ("A+B+C") a partir de niveles, pesos o la columna de la hoja."""
+    if isinstance(mod_levels, str):
+        try:
+            mod_levels = json.loads(mod_levels)
+        except Exception:
+            # la columna "Módulos" de la hoja ya trae la clave armada ("A+B+C")
+            return mod_levels.strip() or "(s/d)"
+    if not isinstance(mod_levels, dict):
+        return "(s/d)"
+    activos = []
+    for m, w in mod_levels.items():
+        # app_ui guarda niveles como texto ("lite", "full"); el parser como pesos
+        if isinstance(w, str) or (w and float(w) > 0):
+            activos.append(m)
+    return "+".join(sorted(activos)) or "(ninguno)"
+
+def _stats_keys(ts: str, cliente_tipo: str, mod_levels: Any,
+                escenario_elegido: str) -> List[Tuple[str, str]]:
+    return [
+        ("total", "*"),
+        ("mes", (ts or "")[:7] or "(s/d)"),
+        ("cliente_tipo", cliente_tipo or "(s/d)"),
+        ("modulos", modulos_key(mod_levels)),
+        ("escenario", escenario_elegido or "(s/d)"),
+    ]
+
+def _bump_stats(cur: sqlite3.Cursor, ts: str, cliente_tipo: str, mod_levels: Any,
+                escenarios: Dict[str, float], escenario_elegido: str = "", sign: int = 1,
+                source: str = STATS_LOCAL) -> None:
+    # sign=-1 descuenta una cotización (p. ej. el estado previo de una revisión)
+    e = escenarios or {}
+    vals = tuple(sign * float(e.get(k) or 0) for k in ("minimo", "logico", "maximo"))
+    cur.executemany("""
+    INSERT INTO quote_stats (source, dim, key, n, sum_minimo, sum_logico, sum_maximo)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(source, dim, key) DO UPDATE SET
+        n = n + excluded.n,
+        sum_minimo = sum_minimo + excluded.sum_minimo,
+        sum_logico = sum_logico + excluded.sum_logico,
+        sum_maximo = sum_maximo + excluded.sum_maximo
+    """, [(source, dim, key, sign) + vals
+          for dim, key in _stats_keys(ts, cliente_tipo, mod_levels, escenario_elegido)])
+
+def _record_args(r: Dict[str, Any]) -> Tuple:
+    """Argumentos de _bump_stats para una fila de la hoja (encabezados o claves del payload)."""
+    def _num(v: Any) -> float:
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return 0.0
+
+    escenarios = {
+        "minimo": _num(r.get("minimo_usd", r.get("Min USD"))),
+        "logico": _num(r.get("logico_usd", r.get("Base USD"))),
+        "maximo": _num(r.get("maximo_usd", r.get("Max USD"))),
+    }
+    return (str(r.get("timestamp") or r.get("Fecha") or ""),
+            str(r.get("cliente_tipo") or r.get("Tipo") or ""),
+            r.get("mod_levels", r.get("Módulos")),
+            escenarios,
+            str(r.get("escenario_elegido") or r.get("Escenario elegido") or ""))
+
+def _mark_rebuilt(cur: sqlite3.Cursor, source: str, n: int) -> None:
+    cur.execute("INSERT OR REPLACE INTO stats_rebuilds (source, ts, n) VALUES (?, ?, ?)",
+                (source, datetime.now().isoformat(timespec="seconds"), n))
+
+def _rebuilt_at(cur: sqlite3.Cursor, source: str) -> Optional[str]:
+    row = cur.execute("SELECT ts FROM stats_rebuilds WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+def stats_rebuilt_at(source: str) -> Optional[str]:
+    """Fecha de la última reconstrucción de los agregados de `source` (None = nunca)."""
+    with _connect() as con:
+        return _rebuilt_at(con.cursor(), source)
+
+def record_quote_stats(cliente_tipo: str, mod_levels: Dict[str, Any],
+                       escenarios: Dict[str, float], escenario_elegido: str = "",
+                       ts: Optional[str] = None, source: str = STATS_SHEETS) -> None:
+    """Suma una cotización a los agregados sin guardarla en `quotes` (p. ej. las que van a Sheets)."""
+    with _connect() as con:
+        _bump_stats(con.cursor(), ts or datetime.now().isoformat(timespec="seconds"),
+                    cliente_tipo, mod_levels, escenarios, escenario_elegido, source=source)
         con.commit()
 
+def record_sheet_row(record: Dict[str, Any]) -> None:
+    """Suma a los agregados de Sheets la fila tal como se escribió en la hoja (igual que al reconstruir)."""
+    with _connect() as con:
+        _bump_stats(con.cursor(), *_record_args(record), source=STATS_SHEETS)
+        con.commit()
+
+def _rebuild_local_stats(cur: sqlite3.Cursor) -> int:
+    cur.execute("DELETE FROM quote_stats WHERE source = ?", (STATS_LOCAL,))
+    quotes = _head_states(cur, cur.execute(f"SELECT {_ROOT_COLS} FROM quotes").fetchall())
+    for q in quotes:
+        _bump_stats(cur, q["ts"], q.get("cliente_tipo"), q.get("mod_levels"), q.get("escenarios"),
+                    q.get("escenario_elegido", ""))
+    _mark_rebuilt(cur, STATS_LOCAL, len(quotes))
+    return len(quotes)
+
+def rebuild_stats() -> int:
+    """Reconstruye los agregados locales desde `quotes` (última revisión de cada una)."""
+    with _connect() as con:
+        n = _rebuild_local_stats(con.cursor())
+        con.commit()
+        return n
+
+def rebuild_stats_from_records(records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Reconstruye los agregados de Sheets desde filas tipo Google Sheets (get_all_records).
+    Acepta tanto los encabezados de la hoja como las claves del payload. Los agregados
+    locales no se tocan.
+    """
+    n = 0
+    with _connect() as con:
+        cur = con.cursor()
+        cur.execute("DELETE FROM quote_stats WHERE source = ?", (STATS_SHEETS,))
+        for r in records:
+            _bump_stats(cur, *_record_args(r), source=STATS_SHEETS)
+            n += 1
+        _mark_rebuilt(cur, STATS_SHEETS, n)
+        con.commit()
+    return n
+
+def read_stats(dim: str, source: Optional[str] = None) -> List[Tuple[str, int, float, float, float]]:
+    """
+    Filas (key, n, sum_minimo, sum_logico, sum_maximo) de una dimensión, ordenadas por key;
+    `source` = STATS_LOCAL / STATS_SHEETS, o None para sumar ambos orígenes.
+    """
+    with _connect() as con:
+        cur = con.cursor()
+        cur.execute("""
+        SELECT key, SUM(n), SUM(sum_minimo), SUM(sum_logico), SUM(sum_maximo)
+        FROM quote_stats WHERE dim = ? AND source = COALESCE(?, source)
+        GROUP BY key HAVING SUM(n) > 0 ORDER BY key
+        """, (dim, source))
+        return cur.fetchall()
+
+# ------------------------
+# Serie histórica de tasas USD→COP (fecha ISO = clave indexada)
+# ------------------------
+def upsert_fx_rates(rows: Iterable[Tuple[str, float, str]]) -> int:
+    """Inserta/actualiza filas (fecha 'YYYY-MM-DD', tasa, fuente)."""
+    rows = list(rows)
+    with _connect() as con:
+        con.executemany("""
+        INSERT INTO fx_history (date, rate, source) VALUES (?, ?, ?)
+        ON CONFLICT(date) DO UPDATE SET rate = excluded.rate, source = excluded.source
+        """, rows)
+        con.commit()
+    return len(rows)
+
+def load_fx_history() -> List[Tuple[str, float]]:
+    with _connect() as con:
+        cur = con.cursor()
+        cur.execute("SELECT date, rate FROM fx_history ORDER BY date")
+        return cur.fetchall()
+
+# ------------------------
+# Briefs: una sola copia comprimida por contenido (tabla `briefs`, clave = sha1 del texto)
+# ------------------------
+def _put_brief(cur: sqlite3.Cursor, brief: str) -> str:
+    raw = (brief or "").encode("utf-8")
+    h = hashlib.sha1(raw).hexdigest()
+    # el mismo brief cotizado con otros parámetros no se vuelve a escribir
+    cur.execute("INSERT OR IGNORE INTO briefs (hash, size, z) VALUES (?, ?, ?)",
+                (h, len(raw), zlib.compress(raw, 9)))
+    return h
+
+def _migrate_briefs(cur: sqlite3.Cursor) -> None:
+    """Bases anteriores: mueve quotes.brief a `briefs` y deja solo el hash en la fila."""
+    rows = cur.execute("SELECT id, brief FROM quotes WHERE brief_hash IS NULL").fetchall()
+    if rows:
+        cur.executemany("UPDATE quotes SET brief_hash = ?, brief = NULL WHERE id = ?",
+                        [(_put_brief(cur, brief), qid) for qid, brief in rows])
+
+@lru_cache(maxsize=64)
+def _brief_text(h: str, db_path: str) -> Optional[str]:
+    # db_path es parte de la clave de la caché; la lectura va por la conexión del hilo
+    con = _connect()
+    try:
+        row = con.execute("SELECT z FROM briefs WHERE hash = ?", (h,)).fetchone()
+    finally:
+        if con is not getattr(_local, "con", None):
+            con.close()
+    return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+def load_brief(brief_hash: Optional[str]) -> str:
+    """Texto de un brief por hash; se descomprime recién acá (al mostrarlo), no al listar."""
+    if not brief_hash:
+        return ""
+    text = _brief_text(brief_hash, _db_path())  # contenido inmutable: la caché no se invalida
+    if text is None:
+        raise KeyError(f"no existe el brief {brief_hash}")
+    return text
+
+# ------------------------
+# Cotizaciones: fila raíz en `quotes` + revisiones como deltas (JSON merge patch, RFC 7386)
+# ------------------------
+_ROOT_COLS = ("id, ts, cliente_nombre, cliente_tipo, brief_hash, mod_levels, base_usd, adjusted_usd, "
+              "escenarios, coefs, head_rev")
+
+def _root_state(row: Tuple) -> Dict[str, Any]:
+    qid, ts, cname, ctype, brief_hash, mods, base, adj, esc, coefs, head_rev = row
+    return {
+        "id": qid, "ts": ts, "rev": 0, "head_rev": head_rev,
+        "cliente_nombre": cname, "cliente_tipo": ctype, "brief_hash": brief_hash,
+        "mod_levels": json.loads(mods or "{}"), "base_usd": base, "adjusted_usd": adj,
+        "escenarios": json.loads(esc or "{}"), "coefs": json.loads(coefs or "{}"),
+        "escenario_elegido": "",
+    }
+
+# campos que versiona una revisión (id, ts y rev son de la fila, no del contenido);
+# el brief se versiona por hash (ver load_brief)
+REVISION_FIELDS = ("cliente_nombre", "cliente_tipo", "brief_hash", "mod_levels", "base_usd",
+                   "adjusted_usd", "escenarios", "coefs", "escenario_elegido")
+
+# None en un patch = clave borrada (RFC 7386); un null guardado como valor va como _NULL
+_NULL = {"~null": 1}
+
+def _enc(v: Any) -> Any:
+    if v is None:
+        return dict(_NULL)
+    if isinstance(v, dict):
+        return {k: _enc(x) for k, x in v.items()}
+    return v
+
+def _dec(v: Any) -> Any:
+    if v == _NULL:
+        return None
+    if isinstance(v, dict):
+        return {k: _dec(x) for k, x in v.items()}
+    return v
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge patch mínimo de old → new (recursivo en dicts; None = clave borrada)."""
+    patch: Dict[str, Any] = {}
+    for k in old.keys() - new.keys():
+        patch[k] = None
+    for k, v in new.items():
+        o = old.get(k)
+        if isinstance(v, dict) and isinstance(o, dict):
+            sub = _diff(o, v)
+            if sub:
+                patch[k] = sub
+        elif k not in old or o != v:
+            patch[k] = _enc(v)
+    return patch
+
+def _apply(state: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(state)
+    for k, v in patch.items():
+        if v is None:
+            out.pop(k, None)
+        elif v == _NULL:
+            out[k] = None
+        elif isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _apply(out[k], v)
+        else:
+            out[k] = _dec(v)
+    return out
+
+def _content(state: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: state[k] for k in REVISION_FIELDS if k in state}
+
+# claves cortas en disco: el delta típico (un nivel + montos) queda en ~100 bytes
+_PACK = {"cliente_nombre": "n", "cliente_tipo": "t", "brief_hash": "h", "mod_levels": "m", "base_usd": "B",
+         "adjusted_usd": "a", "escenarios": "e", "coefs": "c", "escenario_elegido": "s"}
+_UNPACK = {v: k for k, v in _PACK.items()}
+
+def _dumps(patch: Dict[str, Any]) -> str:
+    return json.dumps({_PACK[k]: v for k, v in patch.items()}, ensure_ascii=False, separators=(",", ":"))
+
+def _loads(raw: str) -> Dict[str, Any]:
+    return {_UNPACK[k]: v for k, v in json.loads(raw).items()}
+
+def _state_at(cur: sqlite3.Cursor, root: Dict[str, Any], rev: int) -> Dict[str, Any]:
+    """Estado en `rev`: último snapshot <= rev y los deltas que le siguen."""
+    if rev <= 0:
+        return root
+    rows = cur.execute("""
+    SELECT rev, ts, delta, snapshot FROM quote_revisions
+    WHERE quote_id = ? AND rev <= ? AND rev >= COALESCE(
+        (SELECT MAX(rev) FROM quote_revisions WHERE quote_id = ? AND rev <= ? AND snapshot IS NOT NULL), 1)
+    ORDER BY rev
+    """, (root["id"], rev, root["id"], rev)).fetchall()
+    if not rows or rows[-1][0] != rev:
+        raise KeyError(f"la cotización {root['id']} no tiene la revisión {rev}")
+    state = root
+    for r, ts, delta, snapshot in rows:
+        state = _apply(root, _loads(snapshot)) if snapshot else _apply(state, _loads(delta))
+        state["rev"], state["rev_ts"] = r, ts
+    return state
+
+def _head_states(cur: sqlite3.Cursor, rows: List[Tuple]) -> List[Dict[str, Any]]:
+    """Último estado de varias cotizaciones; las revisiones de todas se leen en una consulta."""
+    roots = [_root_state(r) for r in rows]
+    revised = {q["id"]: q for q in roots if q["head_rev"]}
+    if not revised:
+        return roots
+    marks = ",".join("?" * len(revised))
+    snaps = dict(cur.execute(f"""
+    SELECT quote_id, MAX(rev) FROM quote_revisions
+    WHERE quote_id IN ({marks}) AND snapshot IS NOT NULL GROUP BY quote_id
+    """, list(revised)).fetchall())
+    heads = dict(revised)
+    for qid, r, ts, delta, snapshot in cur.execute(f"""
+    SELECT quote_id, rev, ts, delta, snapshot FROM quote_revisions
+    WHERE quote_id IN ({marks}) ORDER BY quote_id, rev
+    """, list(revised)):
+        if r < snaps.get(qid, 0):
+            continue
+        root = revised[qid]
+        state = _apply(root, _loads(snapshot)) if snapshot else _apply(heads[qid], _loads(delta))
+        state["rev"], state["rev_ts"] = r, ts
+        heads[qid] = state
+    return [heads.get(q["id"], q) for q in roots]
+
 def save_quote(cliente_nombre: str, cliente_tipo: str, brief: str,
                mod_levels: Dict[str, Any], base_usd: float,
                adjusted_usd: float, escenarios: Dict[str, float],
                coefs: Dict[str, float]) -> int:
     with _connect() as con:
         cur = con.cursor()
+        ts = datetime.now().isoformat(timespec="seconds")
         cur.execute("""
-        INSERT INTO quotes (ts, cliente_nombre, cliente_tipo, brief, mod_levels, base_usd, adjusted_usd, escenarios, coefs)
+        INSERT INTO quotes (ts, cliente_nombre, cliente_tipo, brief_hash, mod_levels, base_usd, adjusted_usd, escenarios, coefs)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
-            datetime.now().isoformat(timespec="seconds"),
+            ts,
             cliente_nombre,
             cliente_tipo,
-            brief,
+            _put_brief(cur, brief),
             json.dumps(mod_levels, ensure_ascii=False),
             base_usd,
             adjusted_usd,
             json.dumps(escenarios),
             json.dumps(coefs)
         ))
+        _bump_stats(cur, ts, cliente_tipo, mod_levels, escenarios)
         con.commit()
         return cur.lastrowid
 
-def list_quotes(limit: int = 200) -> List[Tuple]:
+def save_revision(quote_id: int, **changes: Any) -> int:
+    """
+    Guarda una revisión de la cotización con los campos que cambian (mod_levels, coefs,
+    escenarios, escenario_elegido, …; ver REVISION_FIELDS; `brief=` con el texto nuevo
+    se guarda en `briefs` y se versiona su hash). Solo se persiste el delta contra la
+    revisión anterior. Devuelve el número de revisión (sin cambios: la actual).
+    """
+    brief = changes.pop("brief", None)
+    unknown = set(changes) - set(REVISION_FIELDS)
+    if unknown:
+        raise ValueError(f"campos no versionables: {sorted(unknown)}")
     with _connect() as con:
         cur = con.cursor()
+        # head_rev se lee ya con el lock de escritura: dos revisiones concurrentes de la
+        # misma cotización no calculan el mismo número
+        cur.execute("BEGIN IMMEDIATE")
+        row = cur.execute(f"SELECT {_ROOT_COLS} FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no existe la cotización {quote_id}")
+        root = _root_state(row)
+        head = _state_at(cur, root, root["head_rev"])
+        if brief is not None:
+            changes["brief_hash"] = _put_brief(cur, brief)
+        new = {**_content(head), **changes}
+        delta = _diff(_content(head), new)
+        if not delta:
+            return head["rev"]
+        rev = root["head_rev"] + 1
+        ts = datetime.now().isoformat(timespec="seconds")
         cur.execute("""
-        SELECT id, ts, cliente_nombre, cliente_tipo, base_usd, adjusted_usd, escenarios, mod_levels
-        FROM quotes ORDER BY id DESC LIMIT ?
-        """, (limit,))
-        return cur.fetchall()
\ No newline at end of file
+        INSERT INTO quote_revisions (quote_id, rev, ts, delta, snapshot) VALUES (?, ?, ?, ?, ?)
+        """, (quote_id, rev, ts, _dumps(delta),
+              _dumps(_diff(_content(root), new)) if rev % SNAPSHOT_EVERY == 0 else None))
+        cur.execute("UPDATE quotes SET head_rev = ? WHERE id = ?", (rev, quote_id))
+        # los agregados cuentan cada cotización una vez, con su última revisión
+        _bump_stats(cur, root["ts"], head.get("cliente_tipo"), head.get("mod_levels"), head.get("escenarios"),
+                    head.get("escenario_elegido", ""), sign=-1)
+        _bump_stats(cur, root["ts"], new.get("cliente_tipo"), new.get("mod_levels"), new.get("escenarios"),
+                    new.get("escenario_elegido", ""))
+        con.commit()
+        return rev
+
+def quote_state(quote_id: int, rev: Optional[int] = None) -> Dict[str, Any]:
+    """Cotización reconstruida en la revisión `rev` (None = la última). KeyError si no existe."""
+    with _connect() as con:
+        cur = con.cursor()
+        row = cur.execute(f"SELECT {_ROOT_COLS} FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no existe la cotización {quote_id}")
+        root = _root_state(row)
+        return _state_at(cur, root, root["head_rev"] if rev is None else rev)
+
+def quote_history(quote_id: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """
+    (rev, ts, delta) de cada revisión, en orden, para mostrar: el marcador interno de null
+    se decodifica, así que en el delta None es tanto un valor null como una clave borrada.
+    """
+    with _connect() as con:
+        cur = con.cursor()
+        cur.execute("SELECT rev, ts, delta FROM quote_revisions WHERE quote_id = ? ORDER BY rev",
+                    (quote_id,))
+        return [(rev, ts, _dec(_loads(delta))) for rev, ts, delta in cur.fetchall()]
+
+def _list_row(q: Dict[str, Any]) -> Tuple:
+    return (q["id"], q["ts"], q.get("cliente_nombre"), q.get("cliente_tipo"), q.get("base_usd"),
+            q.get("adjusted_usd"), json.dumps(q.get("escenarios") or {}),
+            json.dumps(q.get("mod_levels") or {}, ensure_ascii=False), q["rev"])
+
+def list_quotes(limit: int = 200) -> List[Tuple]:
+    """
+    Últimas cotizaciones con su estado vigente: (id, ts, cliente_nombre, cliente_tipo,
+    base_usd, adjusted_usd, escenarios, mod_levels, rev).
+    """
+    with _connect() as con:
+        cur = con.cursor()
+        rows = cur.execute(f"SELECT {_ROOT_COLS} FROM quotes ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_list_row(q) for q in _head_states(cur, rows)]
+
+def _quote_filters(cliente_tipo: Optional[str], since: Optional[str]) -> Tuple[List[str], List[Any]]:
+    where: List[str] = []
+    args: List[Any] = []
+    if cliente_tipo:
+        where.append("cliente_tipo = ?")
+        args.append(cliente_tipo)
+    if since:
+        where.append("ts >= ?")
+        args.append(since)
+    return where, args
+
+def iter_quote_batches(batch_size: int = 200, cliente_tipo: Optional[str] = None,
+                       since: Optional[str] = None) -> Iterable[List[Tuple]]:
+    """
+    Todas las cotizaciones (más nuevas primero) en tandas de `batch_size` filas con el
+    formato de list_quotes. Lee con fetchmany: la memoria no crece con el tamaño de la tabla.
+    """
+    where, args = _quote_filters(cliente_tipo, since)
+    sql = f"SELECT {_ROOT_COLS} FROM quotes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    con = _connect()
+    owned = con is not getattr(_local, "con", None)
+    cur = con.execute(sql + " ORDER BY id DESC", args)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield [_list_row(q) for q in _head_states(con.cursor(), rows)]
+    finally:
+        cur.close()
+        if owned:
+            con.close()
+
+def quote_batch(before_id: Optional[int] = None, batch_size: int = 200,
+                cliente_tipo: Optional[str] = None, since: Optional[str] = None) -> List[Tuple]:
+    """
+    Una tanda de iter_quote_batches: hasta `batch_size` filas con id < before_id (None = desde
+    la más nueva). Paginación por clave: cada tanda es una consulta corta e independiente,
+    sin cursor abierto entre tandas. La siguiente se pide con el id de la última fila.
+    """
+    where, args = _quote_filters(cliente_tipo, since)
+    if before_id is not None:
+        where.append("id < ?")
+        args.append(before_id)
+    sql = f"SELECT {_ROOT_COLS} FROM quotes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with _connect() as con:
+        cur = con.cursor()
+        rows = cur.execute(sql + " ORDER BY id DESC LIMIT ?", args + [batch_size]).fetchall()
+        return [_list_row(q) for q in _head_states(cur, rows)]
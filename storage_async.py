@@ -0,0 +1,139 @@
+# storage_async.py — fachada async de storage.py para front ends con event loop
+# Cada llamada corre en un executor propio cuyos hilos tienen una conexión SQLite
+# persistente (storage.bind_thread_connection, en WAL): el event loop nunca espera I/O
+# de SQLite y muchas requests concurrentes comparten un pool chico de conexiones.
+#
+#   qid = await save_quote_async("ACME", "PyME", brief, mods, base, adj, escenarios, coefs)
+#   async with contextlib.aclosing(iter_quotes(batch_size=500)) as rows:
+#       async for row in rows:
+#           ...
+#   await aclose_default()  # al apagar
+#
+# iter_quotes pagina por clave (storage.quote_batch): cada tanda es una tarea corta del
+# executor y la siguiente se pide recién cuando el consumidor toma la actual (una de adelanto).
+# Si el consumidor va lento no se lee más (backpressure) y ningún worker queda tomado entre
+# tandas: varios streams abiertos no frenan al resto de las operaciones.
+# Con aclosing, un break descarta la tanda adelantada en el acto.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import storage
+
+DEFAULT_WORKERS = 4
+
+class AsyncStorage:
+    """Executor dedicado + una conexión por hilo; los métodos son corrutinas."""
+
+    def __init__(self, db_path: Optional[str] = None, workers: int = DEFAULT_WORKERS):
+        self._conns: List[Any] = []
+        self._conns_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage",
+                                        initializer=self._bind, initargs=(db_path,))
+
+    def _bind(self, db_path: Optional[str]) -> None:
+        con = storage.bind_thread_connection(db_path)
+        with self._conns_lock:
+            self._conns.append(con)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Corre una función sincrónica de storage en el executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        """Espera a los workers y cierra las conexiones (bloqueante)."""
+        self._pool.shutdown(wait=True)
+        with self._conns_lock:
+            for con in self._conns:
+                con.close()
+            self._conns.clear()
+
+    async def aclose(self) -> None:
+        """close() sin bloquear el event loop (desde una corrutina, p. ej. al apagar)."""
+        await asyncio.to_thread(self.close)
+
+    # --- operaciones ---
+    async def init_db(self) -> None:
+        await self.run(storage.init_db)
+
+    async def save_quote(self, *args: Any, **kwargs: Any) -> int:
+        return await self.run(storage.save_quote, *args, **kwargs)
+
+    async def save_revision(self, quote_id: int, **changes: Any) -> int:
+        return await self.run(storage.save_revision, quote_id, **changes)
+
+    async def quote_state(self, quote_id: int, rev: Optional[int] = None) -> Dict[str, Any]:
+        return await self.run(storage.quote_state, quote_id, rev)
+
+    async def load_brief(self, brief_hash: Optional[str]) -> str:
+        return await self.run(storage.load_brief, brief_hash)
+
+    async def list_quotes(self, limit: int = 200) -> List[Tuple]:
+        return await self.run(storage.list_quotes, limit)
+
+    async def read_stats(self, dim: str, source: Optional[str] = None) -> List[Tuple[str, int, float, float, float]]:
+        return await self.run(storage.read_stats, dim, source)
+
+    async def record_quote_stats(self, *args: Any, **kwargs: Any) -> None:
+        await self.run(storage.record_quote_stats, *args, **kwargs)
+
+    async def iter_quotes(self, batch_size: int = 200, **filters: Any) -> AsyncIterator[Tuple]:
+        """
+        Filas de list_quotes para toda la tabla (o filtrada por cliente_tipo / since),
+        de a una, sin tenerla entera en memoria. A lo sumo una tanda leída por adelantado.
+        Si se puede cortar antes del final, usarlo con contextlib.aclosing.
+        """
+        def fetch(before_id: Optional[int]) -> "asyncio.Future[List[Tuple]]":
+            return asyncio.ensure_future(self.run(storage.quote_batch, before_id, batch_size, **filters))
+
+        pending: Optional[asyncio.Future] = fetch(None)
+        try:
+            while pending is not None:
+                rows = await pending
+                # la próxima tanda se lee mientras el consumidor recorre esta
+                pending = fetch(rows[-1][0]) if len(rows) == batch_size else None
+                for row in rows:
+                    yield row
+        finally:
+            # corte antes del final: la tanda adelantada (una consulta corta) se descarta
+            if pending is not None and not pending.cancel():
+                pending.exception()
+
+_default: Optional[AsyncStorage] = None
+_default_lock = threading.Lock()
+
+def default_storage() -> AsyncStorage:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = AsyncStorage()
+        return _default
+
+def close_default() -> None:
+    """Cierra el executor y las conexiones de la instancia por defecto (al apagar el servidor)."""
+    global _default
+    with _default_lock:
+        if _default is not None:
+            _default.close()
+            _default = None
+
+async def aclose_default() -> None:
+    """close_default() sin bloquear el event loop."""
+    await asyncio.to_thread(close_default)
+
+# Atajos sobre la instancia por defecto
+async def save_quote_async(*args: Any, **kwargs: Any) -> int:
+    return await default_storage().save_quote(*args, **kwargs)
+
+async def save_revision_async(quote_id: int, **changes: Any) -> int:
+    return await default_storage().save_revision(quote_id, **changes)
+
+async def quote_state_async(quote_id: int, rev: Optional[int] = None) -> Dict[str, Any]:
+    return await default_storage().quote_state(quote_id, rev)
+
+def iter_quotes(batch_size: int = 200, **filters: Any) -> AsyncIterator[Tuple]:
+    return default_storage().iter_quotes(batch_size, **filters)
@@ -0,0 +1,177 @@
+# tenants.py — catálogos y perfiles de estudio por tenant (varios estudios / oficinas)
+# tenants.json define qué catálogo y qué datos de estudio usa cada tenant:
+#
+#   {"default": "bravo",
+#    "tenants": {"bravo": {"catalog": "catalog.json", "studio": {"nombre": "This is Bravo", ...}}},
+#    "users": {"ana@estudio.mx": "mx"}}
+#
+# Sin tenants.json hay un solo tenant ("bravo") con catalog.json y el perfil por defecto.
+# Cada catálogo se valida y compila una vez por (tenant, versión del archivo) y queda en un
+# LRU acotado: un proceso cotiza para muchos tenants sin releer JSON en cada rerun.
+
+import json
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+HERE = Path(__file__).parent
+TENANTS_PATH = HERE / "tenants.json"
+DEFAULT_TENANT = "bravo"
+CATALOG_CACHE_SIZE = 16  # catálogos compilados en memoria (tenant × versión)
+
+@dataclass(frozen=True)
+class StudioProfile:
+    nombre: str = "This is Bravo"
+    web: str = "www.thisisbravo.co"
+    mail: str = "hola@thisisbravo.co"
+    eslogan: str = "LATAM BRAND STUDIO"
+    logo_url: str = "https://thisisbravo.co/wp-content/uploads/2025/11/logo.png"
+    footer_logo_url: str = "https://thisisbravo.co/wp-content/uploads/2025/11/LOGO-CENTRADO.png"
+    primary_hex: str = "#C0B7F9"
+    secondary_hex: str = "#F4D4BD"
+    validity_days: int = 30
+    payment_terms: str = "50% al inicio del proyecto. 50% restante contra entrega de los materiales."
+    validity_text: str = "Esta propuesta tiene una validez de 30 días a partir de la fecha de emisión."
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StudioProfile":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"campos de estudio desconocidos: {sorted(unknown)}")
+        return cls(**data)
+
+    def context(self) -> Dict[str, Any]:
+        """kwargs de estudio para render_quote_html / build_quote_context."""
+        return {
+            "estudio_nombre": self.nombre,
+            "estudio_web": self.web,
+            "estudio_mail": self.mail,
+            "studio_logo_url": self.logo_url,
+            "primary_hex": self.primary_hex,
+            "secondary_hex": self.secondary_hex,
+            "validity_days": self.validity_days,
+            "payment_terms": self.payment_terms,
+            "validity_text": self.validity_text,
+        }
+
+    def footer_context(self) -> Dict[str, Any]:
+        """kwargs para render_quote_footer_html."""
+        return {
+            "estudio_nombre": self.nombre,
+            "estudio_web": self.web,
+            "estudio_mail": self.mail,
+            "estudio_eslogan": self.eslogan,
+            "studio_logo_url": self.footer_logo_url,
+        }
+
+DEFAULT_STUDIO = StudioProfile()
+
+@dataclass(frozen=True)
+class Tenant:
+    id: str
+    catalog_path: Path
+    studio: StudioProfile = field(default=DEFAULT_STUDIO)
+
+# ------------------------
+# Registro de tenants
+# ------------------------
+def _stamp(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+@lru_cache(maxsize=4)
+def _load_registry(path: str, _stamp: Tuple[int, int]) -> Tuple[str, Dict[str, Tenant], Dict[str, str]]:
+    base = Path(path).parent
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    tenants: Dict[str, Tenant] = {}
+    for tid, spec in (data.get("tenants") or {}).items():
+        if "catalog" not in spec:
+            raise ValueError(f"tenant '{tid}' sin 'catalog'")
+        tenants[tid] = Tenant(tid, base / spec["catalog"], StudioProfile.from_dict(spec.get("studio") or {}))
+    if not tenants:
+        raise ValueError(f"{path}: no define ningún tenant")
+    default = data.get("default") or next(iter(tenants))
+    if default not in tenants:
+        raise ValueError(f"{path}: tenant por defecto desconocido: {default}")
+    users = {str(email).lower(): tid for email, tid in (data.get("users") or {}).items()}
+    bad = sorted(set(users.values()) - set(tenants))
+    if bad:
+        raise ValueError(f"{path}: usuarios asignados a tenants desconocidos: {bad}")
+    return default, tenants, users
+
+def registry(path: Path = TENANTS_PATH) -> Tuple[str, Dict[str, Tenant], Dict[str, str]]:
+    """(tenant por defecto, tenants por id, email → tenant); se relee solo si tenants.json cambió."""
+    if not path.exists():
+        return DEFAULT_TENANT, {DEFAULT_TENANT: Tenant(DEFAULT_TENANT, HERE / "catalog.json")}, {}
+    return _load_registry(str(path), _stamp(path))
+
+def tenant_ids() -> List[str]:
+    return list(registry()[1])
+
+def tenant_for_user(email: Optional[str]) -> Optional[str]:
+    """Tenant asignado al usuario en tenants.json (None si no tiene uno fijo)."""
+    return registry()[2].get((email or "").strip().lower())
+
+def get_tenant(tenant_id: Optional[str] = None) -> Tenant:
+    """Tenant por id (None → el de por defecto). ValueError si no existe."""
+    default, tenants, _ = registry()
+    tid = tenant_id or default
+    if tid not in tenants:
+        raise ValueError(f"tenant desconocido: {tid}")
+    return tenants[tid]
+
+def pick_tenant(*candidates: Optional[str]) -> Tenant:
+    """Primer tenant existente entre `candidates` (en orden de prioridad); si no, el de por defecto."""
+    ids = registry()[1]
+    for tid in candidates:
+        if tid in ids:
+            return ids[tid]
+    return get_tenant()
+
+# ------------------------
+# Catálogos compilados
+# ------------------------
+REQUIRED_SECTIONS = ("moneda", "precios", "coeficientes", "escenarios")
+REQUIRED_PRICES = ("A", "B", "C_full", "C_rebranding", "C_refresh", "D_full", "D_lite", "E_full", "E_lite", "E_plus")
+
+def compile_catalog(raw: Dict[str, Any], source: str = "catálogo") -> Dict[str, Any]:
+    """
+    Valida la estructura que usa pricing y deja los montos como float. ValueError con
+    todo lo que falta (no solo el primer error).
+    """
+    errors = [f"falta la sección '{s}'" for s in REQUIRED_SECTIONS if not isinstance(raw.get(s), dict)]
+    precios = raw.get("precios") or {}
+    errors += [f"falta precios.{k}" for k in REQUIRED_PRICES if k not in precios]
+    escenarios = raw.get("escenarios") or {}
+    errors += [f"falta escenarios.{k}" for k in ("minimo", "logico", "maximo") if k not in escenarios]
+    if "usd_to_cop" not in (raw.get("moneda") or {}):
+        errors.append("falta moneda.usd_to_cop")
+    if errors:
+        raise ValueError(f"{source}: " + "; ".join(errors))
+    out = dict(raw)
+    try:
+        out["precios"] = {k: float(v) for k, v in precios.items()}
+        out["escenarios"] = {k: float(v) for k, v in escenarios.items()}
+        out["moneda"] = {k: (float(v) if isinstance(v, (int, float, str)) and k.startswith("usd_to_") else v)
+                         for k, v in raw["moneda"].items()}
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{source}: monto no numérico ({e})") from None
+    return out
+
+@lru_cache(maxsize=CATALOG_CACHE_SIZE)
+def _compiled_catalog(tenant_id: str, path: str, _version: Tuple[int, int]) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as fh:
+        raw = json.load(fh)
+    return compile_catalog(raw, f"{tenant_id} ({Path(path).name})")
+
+def catalog_version(tenant: Optional[str] = None) -> Tuple[int, int]:
+    """Versión (mtime, tamaño) del catálogo del tenant; sirve de clave para memos."""
+    return _stamp(get_tenant(tenant).catalog_path)
+
+def catalog_for(tenant: Optional[str] = None) -> Dict[str, Any]:
+    """Catálogo compilado del tenant (compartido entre llamadas: no mutarlo)."""
+    t = get_tenant(tenant)
+    return _compiled_catalog(t.id, str(t.catalog_path), _stamp(t.catalog_path))
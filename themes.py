@@ -0,0 +1,105 @@
+# themes.py — CSS de la UI compilado una vez por proceso (minificado + hash por modo)
+# e inyectado una sola vez por sesión en el <head> de la página, en lugar de mandar
+# ~300 líneas de <style> por el websocket en cada rerun.
+#
+# Fuentes en assets/css/: base.css (tipografía), cards.css (tarjetas),
+# vars-<modo>.css (tokens del tema) y theme.css (reglas que usan esos tokens).
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+CSS_DIR = Path(__file__).parent / "assets" / "css"
+THEME_MODES = ("dark", "light")
+APP_PARTS = ("base.css", "cards.css", "vars-{mode}.css", "theme.css")
+
+@dataclass(frozen=True)
+class CssBundle:
+    name: str
+    css: str
+    digest: str
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}.{self.digest}.css"
+
+_COMMENTS = re.compile(r"/\*.*?\*/", re.S)
+_SPACES = re.compile(r"\s+")
+_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+def minify_css(css: str) -> str:
+    """Minificado conservador: comentarios, espacios redundantes y ';' finales."""
+    css = _COMMENTS.sub("", css)
+    css = _SPACES.sub(" ", css)
+    css = _PUNCT.sub(r"\1", css)
+    css = css.replace(": ", ":").replace(";}", "}")
+    return css.strip()
+
+@lru_cache(maxsize=32)
+def make_bundle(name: str, css: str) -> CssBundle:
+    mini = minify_css(css)
+    return CssBundle(name, mini, hashlib.sha1(mini.encode("utf-8")).hexdigest()[:12])
+
+@lru_cache(maxsize=None)
+def app_bundle(mode: str = "dark") -> CssBundle:
+    """Bundle completo de app.py para `mode` ('dark' | 'light'); se lee de disco una vez."""
+    if mode not in THEME_MODES:
+        raise ValueError(f"modo de tema inválido: {mode}")
+    parts = [(CSS_DIR / p.format(mode=mode)).read_text(encoding="utf-8") for p in APP_PARTS]
+    return make_bundle(f"app-{mode}", "\n".join(parts))
+
+def write_assets(out_dir: str) -> list:
+    """Escribe los bundles como archivos con hash (para servirlos estáticos si se quiere)."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for mode in THEME_MODES:
+        b = app_bundle(mode)
+        path = out / b.filename
+        path.write_text(b.css, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+# ------------------------
+# Inyección (Streamlit)
+# ------------------------
+_INJECT_JS = """<script>
+(function(){
+  try {
+    var doc = window.parent.document;
+    var el = doc.getElementById(%(slot)s);
+    if (!el) { el = doc.createElement("style"); el.id = %(slot)s; doc.head.appendChild(el); }
+    if (el.getAttribute("data-hash") !== %(digest)s) {
+      el.textContent = %(css)s;
+      el.setAttribute("data-hash", %(digest)s);
+    }
+  } catch (e) {}
+})();
+</script>"""
+
+def inject(bundle: CssBundle, slot: str = "bravo-theme") -> None:
+    """
+    Inyecta `bundle` en un <style id=slot> del documento padre, solo si la sesión
+    todavía no tiene ese hash en ese slot. El <style> sobrevive a los reruns aunque el
+    iframe que lo creó desaparezca; cambiar de modo reemplaza el contenido del slot.
+    """
+    import streamlit as st
+    import streamlit.components.v1 as components
+
+    state_key = f"_css_{slot}"
+    if st.session_state.get(state_key) == bundle.digest:
+        return
+    components.html(_INJECT_JS % {
+        "slot": json.dumps(slot),
+        "digest": json.dumps(bundle.digest),
+        "css": json.dumps(bundle.css),
+    }, height=0)
+    st.session_state[state_key] = bundle.digest
+
+if __name__ == "__main__":
+    import sys
+    for p in write_assets(sys.argv[1] if len(sys.argv) > 1 else "static"):
+        print(p)
@@ -0,0 +1,146 @@
+# tracing.py — spans anidables por etapa (parser, pricing, FX, Sheets, PDF…)
+# Las mediciones van a un ring buffer en memoria y a totales acumulados por etapa,
+# exportables como JSON o texto Prometheus. Deshabilitado, span() devuelve un
+# context manager nulo compartido: el costo es una llamada y un if.
+#
+#   with tracing.span("calcular"):
+#       with tracing.span("parser"):
+#           ...
+#
+# Se habilita para todo el proceso con COTIZADOR_TRACE=1 o tracing.enable(), o solo para
+# el hilo actual (p. ej. la sesión de Streamlit que abrió el panel) con enable_thread().
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+BUFFER_SIZE = 2048
+
+_enabled = os.environ.get("COTIZADOR_TRACE", "") not in ("", "0")
+_buffer: Deque[Dict[str, Any]] = deque(maxlen=BUFFER_SIZE)
+_totals: Dict[str, List[float]] = {}  # stage → [count, sum, max]
+_lock = threading.Lock()
+_local = threading.local()
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+_NULL = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "path", "start", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = name
+        self.start = 0.0
+        self.error = False
+
+    def __enter__(self) -> "_Span":
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        if stack:
+            self.path = f"{stack[-1].path}/{self.name}"
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        dur = time.perf_counter() - self.start
+        _local.stack.pop()
+        rec = {
+            "stage": self.path,
+            "ms": round(dur * 1000, 3),
+            "ts": time.time(),
+            "thread": threading.current_thread().name,
+            "error": exc_type is not None,
+        }
+        with _lock:
+            _buffer.append(rec)
+            t = _totals.get(self.path)
+            if t is None:
+                _totals[self.path] = [1, dur, dur]
+            else:
+                t[0] += 1; t[1] += dur
+                if dur > t[2]: t[2] = dur
+        return None
+
+def span(name: str):
+    """Context manager que mide la etapa `name` (anidable)."""
+    return _Span(name) if _enabled or getattr(_local, "on", False) else _NULL
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorador: envuelve la función en un span (el chequeo de habilitado es por llamada)."""
+    def deco(fn: Callable) -> Callable:
+        stage = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not (_enabled or getattr(_local, "on", False)):
+                return fn(*args, **kwargs)
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = bool(on)
+
+def enable_thread(on: bool = True) -> None:
+    """Habilita (o no) los spans solo en el hilo actual, además del switch global."""
+    _local.on = bool(on)
+
+def is_enabled() -> bool:
+    return _enabled or getattr(_local, "on", False)
+
+def reset() -> None:
+    with _lock:
+        _buffer.clear()
+        _totals.clear()
+
+def recent(n: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Últimos spans cerrados (más reciente al final)."""
+    with _lock:
+        items = list(_buffer)
+    return items[-n:] if n else items
+
+def summary() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {
+            stage: {"count": int(c), "sum_ms": round(s * 1000, 3),
+                    "avg_ms": round(s * 1000 / c, 3), "max_ms": round(m * 1000, 3)}
+            for stage, (c, s, m) in sorted(_totals.items())
+        }
+
+def export_json(n: Optional[int] = None) -> str:
+    return json.dumps({"summary": summary(), "spans": recent(n)}, ensure_ascii=False)
+
+def export_prometheus() -> str:
+    lines = [
+        "# HELP cotizador_stage_seconds Duración por etapa del flujo de cotización.",
+        "# TYPE cotizador_stage_seconds summary",
+    ]
+    with _lock:
+        items = sorted(_totals.items())
+    for stage, (c, s, _m) in items:
+        label = stage.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'cotizador_stage_seconds_count{{stage="{label}"}} {int(c)}')
+        lines.append(f'cotizador_stage_seconds_sum{{stage="{label}"}} {s:.6f}')
+    lines.append("# HELP cotizador_stage_seconds_max Duración máxima observada por etapa.")
+    lines.append("# TYPE cotizador_stage_seconds_max gauge")
+    for stage, (_c, _s, m) in items:
+        label = stage.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'cotizador_stage_seconds_max{{stage="{label}"}} {m:.6f}')
+    return "\n".join(lines) + "\n"